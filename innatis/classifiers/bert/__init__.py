@@ -2,3 +2,7 @@ from .optimization import *
 from .run_classifier import *
 from .tokenization import *
 from .modeling import *
+from .feature_cache import *
+from .inference_graph import *
+from .quantization import *
+from .distillation import *
@@ -0,0 +1,172 @@
+"""Distillation of a trained BERT intent classifier into a smaller student."""
+
+import copy
+
+import numpy as np
+import tensorflow as tf
+
+from innatis.classifiers.bert.modeling import BertConfig
+from innatis.classifiers.bert.optimization import create_optimizer
+from innatis.classifiers.bert.run_classifier import create_model, model_fn_builder
+
+
+def student_bert_config(vocab_size, overrides=None, base_config=None):
+    """Returns the `BertConfig` of the student model.
+
+    Starts from `base_config` (or the `BertConfig` defaults) and applies the
+    `overrides`, e.g. `{"num_hidden_layers": 4, "hidden_size": 312}`. The
+    vocab size always follows the tokenizer, since the student is fed the
+    same input ids as the serving model.
+    """
+    if base_config:
+        config = copy.deepcopy(base_config)
+    else:
+        config = BertConfig(vocab_size=vocab_size)
+
+    for key, value in (overrides or {}).items():
+        if key not in config.__dict__:
+            raise ValueError("Unknown BertConfig parameter '{}'".format(key))
+        setattr(config, key, value)
+    config.vocab_size = vocab_size
+
+    if config.hidden_size % config.num_attention_heads:
+        raise ValueError(
+            "The student hidden_size ({}) is not a multiple of its "
+            "num_attention_heads ({})".format(
+                config.hidden_size, config.num_attention_heads
+            )
+        )
+    return config
+
+
+def distillation_input_fn_builder(
+    arrays, teacher_log_probs, seq_length, is_training, drop_remainder
+):
+    """Like `array_input_fn_builder`, with the teacher's `log_probs` for each
+    example as an extra `teacher_log_probs` feature."""
+
+    def input_fn(params):
+        batch_size = params["batch_size"]
+
+        num_examples = len(arrays["label_ids"])
+
+        d = tf.data.Dataset.from_tensor_slices(
+            {
+                "input_ids": tf.constant(
+                    np.asarray(arrays["input_ids"], dtype=np.int32),
+                    shape=[num_examples, seq_length],
+                    dtype=tf.int32,
+                ),
+                "input_mask": tf.constant(
+                    np.asarray(arrays["input_mask"], dtype=np.int32),
+                    shape=[num_examples, seq_length],
+                    dtype=tf.int32,
+                ),
+                "segment_ids": tf.constant(
+                    np.asarray(arrays["segment_ids"], dtype=np.int32),
+                    shape=[num_examples, seq_length],
+                    dtype=tf.int32,
+                ),
+                "label_ids": tf.constant(
+                    np.asarray(arrays["label_ids"], dtype=np.int32),
+                    shape=[num_examples],
+                    dtype=tf.int32,
+                ),
+                "teacher_log_probs": tf.constant(
+                    np.asarray(teacher_log_probs, dtype=np.float32),
+                    shape=np.shape(teacher_log_probs),
+                    dtype=tf.float32,
+                ),
+            }
+        )
+
+        if is_training:
+            d = d.repeat()
+            d = d.shuffle(buffer_size=100)
+
+        d = d.batch(batch_size=batch_size, drop_remainder=drop_remainder)
+        return d
+
+    return input_fn
+
+
+def distillation_model_fn_builder(
+    bert_config,
+    num_labels,
+    learning_rate,
+    num_train_steps,
+    num_warmup_steps,
+    temperature=2.0,
+    alpha=0.5,
+):
+    """Returns a `model_fn` training a `BertModel` student on the teacher's
+    soft targets.
+
+    The loss is `alpha` times the cross entropy with the teacher's
+    probabilities, both softened by `temperature` and scaled by its square,
+    plus `1 - alpha` times the usual cross entropy with the labels. In
+    `PREDICT` mode the student is the same graph as `model_fn_builder`
+    builds, so it is exported and served like any other model.
+    """
+    predict_model_fn = model_fn_builder(
+        bert_tfhub_module_handle=None,
+        num_labels=num_labels,
+        learning_rate=learning_rate,
+        num_train_steps=num_train_steps,
+        num_warmup_steps=num_warmup_steps,
+        bert_config=bert_config,
+    )
+
+    def model_fn(features, labels, mode, params):  # pylint: disable=unused-argument
+        if mode == tf.estimator.ModeKeys.PREDICT:
+            return predict_model_fn(features, labels, mode, params)
+
+        label_ids = features["label_ids"]
+
+        (hard_loss, predicted_labels, log_probs) = create_model(
+            False,
+            features["input_ids"],
+            features["input_mask"],
+            features["segment_ids"],
+            label_ids,
+            num_labels,
+            bert_config=bert_config,
+        )
+
+        with tf.variable_scope("distillation"):
+            # `log_probs` only differ from the logits by a constant per
+            # example, so they soften the same way
+            soft_targets = tf.nn.softmax(features["teacher_log_probs"] / temperature)
+            student_log_probs = tf.nn.log_softmax(log_probs / temperature)
+            soft_loss = tf.reduce_mean(
+                -tf.reduce_sum(soft_targets * student_log_probs, axis=-1)
+            )
+            loss = alpha * temperature ** 2 * soft_loss + (1 - alpha) * hard_loss
+
+        if mode == tf.estimator.ModeKeys.TRAIN:
+            train_op = create_optimizer(
+                loss, learning_rate, num_train_steps, num_warmup_steps, use_tpu=False
+            )
+            accuracy = tf.metrics.accuracy(label_ids, predicted_labels)
+            logging_hook = tf.train.LoggingTensorHook(
+                {
+                    "loss": loss,
+                    "soft_loss": soft_loss,
+                    "hard_loss": hard_loss,
+                    "accuracy": accuracy[1],
+                },
+                every_n_iter=1,
+            )
+            return tf.estimator.EstimatorSpec(
+                mode=mode, loss=loss, train_op=train_op, training_hooks=[logging_hook]
+            )
+
+        return tf.estimator.EstimatorSpec(
+            mode=mode,
+            loss=loss,
+            eval_metric_ops={
+                "eval_accuracy": tf.metrics.accuracy(label_ids, predicted_labels)
+            },
+        )
+
+    return model_fn
@@ -0,0 +1,86 @@
+"""On-disk cache of tokenized BERT training features."""
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import tensorflow as tf
+
+from innatis.classifiers.bert.run_classifier import (
+    convert_examples_to_features,
+    features_to_arrays,
+)
+
+FEATURE_ARRAYS = ("input_ids", "input_mask", "segment_ids", "label_ids")
+
+
+def _vocab_sha1(vocab):
+    # The in-memory vocab, since a tokenizer loaded with a model only has the
+    # compiled vocab file
+    sha1 = hashlib.sha1()
+    for token, index in sorted(vocab.items(), key=lambda item: item[1]):
+        sha1.update(u"{}\x00{}\x00".format(token, index).encode("utf-8"))
+    return sha1.hexdigest()
+
+
+def features_cache_key(examples, label_list, max_seq_length, tokenizer):
+    """Hash of everything the converted features depend on.
+
+    Covers the example texts and labels, the label list, the tokenizer's
+    vocab, the casing and `max_seq_length`.
+    """
+    sha1 = hashlib.sha1()
+
+    def update(*values):
+        for value in values:
+            sha1.update(u"{}\x00".format(value).encode("utf-8"))
+
+    update(_vocab_sha1(tokenizer.vocab), tokenizer.do_lower_case, max_seq_length)
+    update(len(label_list), *label_list)
+    for example in examples:
+        update(example.text_a, example.text_b, example.label)
+
+    return sha1.hexdigest()
+
+
+def load_or_convert_features(
+    examples, label_list, max_seq_length, tokenizer, cache_dir, num_workers=1
+):
+    """Returns the `features_to_arrays` dict for `examples`.
+
+    The arrays are read memory-mapped from `cache_dir` if the same examples
+    were converted before with the same vocab and `max_seq_length`. Otherwise
+    the examples are tokenized and the arrays are written to the cache.
+    """
+    key = features_cache_key(examples, label_list, max_seq_length, tokenizer)
+    entry_dir = os.path.join(cache_dir, key)
+
+    if os.path.isdir(entry_dir):
+        tf.logging.info("Loading cached features from %s", entry_dir)
+        return {
+            name: np.load(os.path.join(entry_dir, name + ".npy"), mmap_mode="r")
+            for name in FEATURE_ARRAYS
+        }
+
+    features = convert_examples_to_features(
+        examples, label_list, max_seq_length, tokenizer, num_workers
+    )
+    arrays = features_to_arrays(features, max_seq_length)
+
+    # Write into a temporary dir first, so that an interrupted run never
+    # leaves a half written entry behind.
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    tmp_dir = tempfile.mkdtemp(dir=cache_dir)
+    try:
+        for name in FEATURE_ARRAYS:
+            np.save(os.path.join(tmp_dir, name + ".npy"), arrays[name])
+        os.rename(tmp_dir, entry_dir)
+        tf.logging.info("Cached features in %s", entry_dir)
+    except OSError as e:
+        tf.logging.warning("Could not cache features in %s: %s", entry_dir, e)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return arrays
@@ -0,0 +1,132 @@
+"""Frozen, inference-only graphs of exported BERT classifiers."""
+
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.tools.graph_transforms import TransformGraph
+
+from innatis.classifiers.bert.quantization import dequantize_graph_def
+
+# Signature inputs the classifier needs at inference time. `label_ids` is only
+# there because the Estimator's `model_fn` reads it, and is stripped.
+INFERENCE_INPUTS = ("input_ids", "input_mask", "segment_ids")
+
+INFERENCE_OUTPUT = "probabilities"
+
+GRAPH_TRANSFORMS = [
+    "strip_unused_nodes",
+    "remove_nodes(op=Identity, op=CheckNumerics, op=StopGradient)",
+    "fold_constants(ignore_errors=true)",
+    "fold_batch_norms",
+    "sort_by_execution_order",
+]
+
+
+def _node_name(tensor_name):
+    return tensor_name.split(":")[0]
+
+
+def freeze_saved_model(saved_model_dir, frozen_graph_file):
+    """Writes the serving signature of a SavedModel as a frozen GraphDef.
+
+    Variables become constants, and everything the output does not depend
+    on (training ops, unused inputs, identities) is stripped before constants
+    are folded.
+
+    Returns the input and output tensor names of the frozen graph.
+    """
+    graph = tf.Graph()
+    with graph.as_default(), tf.Session(graph=graph) as sess:
+        meta_graph = tf.saved_model.loader.load(
+            sess, [tf.saved_model.tag_constants.SERVING], saved_model_dir
+        )
+        signature = meta_graph.signature_def[
+            tf.saved_model.signature_constants.DEFAULT_SERVING_SIGNATURE_DEF_KEY
+        ]
+        inputs = {name: signature.inputs[name].name for name in INFERENCE_INPUTS}
+        output = signature.outputs[INFERENCE_OUTPUT].name
+
+        graph_def = tf.graph_util.convert_variables_to_constants(
+            sess, graph.as_graph_def(), [_node_name(output)]
+        )
+
+    input_nodes = [_node_name(name) for name in inputs.values()]
+    output_nodes = [_node_name(output)]
+
+    graph_def = tf.graph_util.remove_training_nodes(
+        graph_def, protected_nodes=input_nodes + output_nodes
+    )
+    graph_def = TransformGraph(graph_def, input_nodes, output_nodes, GRAPH_TRANSFORMS)
+
+    with tf.gfile.GFile(frozen_graph_file, "wb") as writer:
+        writer.write(graph_def.SerializeToString())
+
+    return {"inputs": inputs, "output": output}
+
+
+class FrozenGraphPredictor(object):
+    """Runs a graph written by `freeze_saved_model`.
+
+    Called the same way as a `tf.contrib.predictor` predictor, with a dict
+    of input arrays, and returns a dict with the `probabilities`. Weights of
+    quantized graphs are dequantized once, when the graph is loaded.
+    """
+
+    def __init__(self, frozen_graph_file, inputs, output, config=None, graph=None):
+        graph_def = tf.GraphDef()
+        with tf.gfile.GFile(frozen_graph_file, "rb") as reader:
+            graph_def.ParseFromString(reader.read())
+        graph_def = dequantize_graph_def(graph_def)
+
+        self.graph = graph or tf.Graph()
+        with self.graph.as_default():
+            tf.import_graph_def(graph_def, name="")
+
+        self.session = tf.Session(graph=self.graph, config=config)
+        self.inputs = {
+            name: self.graph.get_tensor_by_name(tensor_name)
+            for name, tensor_name in inputs.items()
+        }
+        self.output = self.graph.get_tensor_by_name(output)
+
+    def __call__(self, features):
+        feed_dict = {tensor: features[name] for name, tensor in self.inputs.items()}
+        return {INFERENCE_OUTPUT: self.session.run(self.output, feed_dict=feed_dict)}
+
+
+def _path_size(path):
+    if not tf.gfile.IsDirectory(path):
+        return tf.gfile.Stat(path).length
+    return sum(
+        tf.gfile.Stat(os.path.join(dir_name, file_name)).length
+        for dir_name, _, file_names in tf.gfile.Walk(path)
+        for file_name in file_names
+    )
+
+
+def _median_latency_ms(predict_fn, features, num_runs):
+    # The first call pays for lazy initialization, so it is not timed
+    predict_fn(features)
+    latencies = []
+    for _ in range(num_runs):
+        start = time.time()
+        predict_fn(features)
+        latencies.append(time.time() - start)
+    return float(np.median(latencies) * 1000)
+
+
+def compare_exports(exports, features, num_runs=20):
+    """Size on disk and single request latency of exported models.
+
+    `exports` maps a name to a `(path, predict_fn)` pair, `features` is one
+    request's worth of predictor inputs.
+    """
+    return {
+        name: {
+            "size_mb": _path_size(path) / float(1 << 20),
+            "latency_ms": _median_latency_ms(predict_fn, features, num_runs),
+        }
+        for name, (path, predict_fn) in exports.items()
+    }
@@ -0,0 +1,152 @@
+"""Post-training int8 quantization of the weights in a frozen BERT graph."""
+
+import re
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.python.framework import tensor_util
+
+# Dense kernels of the attention (query, key, value and output), intermediate
+# and output layers, the pooler, and the embedding tables in `modeling.py`.
+# The TF Hub module nests them in its own scope, e.g. `module/bert/...`
+QUANTIZED_WEIGHTS = r"(^|/)bert/.*(/kernel|_embeddings)$"
+
+VALUES_SUFFIX = "/int8_values"
+SCALES_SUFFIX = "/int8_scales"
+CAST_SUFFIX = "/int8_cast"
+
+
+def _channel_axis(name):
+    # Dense kernels are [in, out] and get a scale per output unit, embedding
+    # tables are [vocab, hidden] and get a scale per token
+    return 0 if name.endswith("_embeddings") else 1
+
+
+def quantize_weights(weights, axis):
+    """Symmetric int8 quantization with one scale per slice along `axis`.
+
+    Returns the int8 values and the float32 scales, which broadcast against
+    the values so that `values * scales` approximates `weights`.
+    """
+    reduce_axes = tuple(i for i in range(weights.ndim) if i != axis)
+    scales = np.max(np.abs(weights), axis=reduce_axes, keepdims=True) / 127.0
+    scales[scales == 0] = 1.0
+    values = np.clip(np.round(weights / scales), -127, 127).astype(np.int8)
+    return values, scales.astype(np.float32)
+
+
+def _const_node(name, array, device=""):
+    node = tf.NodeDef(name=name, op="Const", device=device)
+    node.attr["dtype"].type = tf.as_dtype(array.dtype).as_datatype_enum
+    node.attr["value"].tensor.CopyFrom(tf.make_tensor_proto(array))
+    return node
+
+
+def _is_quantizable(node, pattern):
+    if node.op != "Const" or not re.search(pattern, node.name):
+        return False
+    tensor = node.attr["value"].tensor
+    return tensor.dtype == tf.float32.as_datatype_enum and (
+        len(tensor.tensor_shape.dim) == 2
+    )
+
+
+def _copy_without_nodes(graph_def):
+    output = tf.GraphDef()
+    output.CopyFrom(graph_def)
+    del output.node[:]
+    return output
+
+
+def quantize_graph_def(graph_def, pattern=QUANTIZED_WEIGHTS):
+    """Stores the float weights matching `pattern` as int8 values and scales.
+
+    Each weight `w` becomes the constants `w/int8_values` and `w/int8_scales`,
+    and `w` itself turns into the op computing `cast(values) * scales`, so
+    the quantized graph runs as is. `dequantize_graph_def` folds it back
+    into float constants.
+
+    Raises a `ValueError` if no weight matches `pattern`, rather than
+    returning the float graph as if it was quantized.
+    """
+    output = _copy_without_nodes(graph_def)
+    num_quantized = 0
+
+    for node in graph_def.node:
+        if not _is_quantizable(node, pattern):
+            output.node.extend([node])
+            continue
+        num_quantized += 1
+
+        weights = tensor_util.MakeNdarray(node.attr["value"].tensor)
+        values, scales = quantize_weights(weights, _channel_axis(node.name))
+
+        cast = tf.NodeDef(
+            name=node.name + CAST_SUFFIX,
+            op="Cast",
+            input=[node.name + VALUES_SUFFIX],
+            device=node.device,
+        )
+        cast.attr["SrcT"].type = tf.int8.as_datatype_enum
+        cast.attr["DstT"].type = tf.float32.as_datatype_enum
+
+        dequantized = tf.NodeDef(
+            name=node.name,
+            op="Mul",
+            input=[cast.name, node.name + SCALES_SUFFIX],
+            device=node.device,
+        )
+        dequantized.attr["T"].type = tf.float32.as_datatype_enum
+
+        output.node.extend(
+            [
+                _const_node(node.name + VALUES_SUFFIX, values, node.device),
+                _const_node(node.name + SCALES_SUFFIX, scales, node.device),
+                cast,
+                dequantized,
+            ]
+        )
+
+    if not num_quantized:
+        raise ValueError(
+            "No float32 matrix in the graph matches '{}', nothing was "
+            "quantized".format(pattern)
+        )
+    tf.logging.info("Quantized %d weights to int8", num_quantized)
+
+    return output
+
+
+def dequantize_graph_def(graph_def):
+    """Replaces the weights quantized by `quantize_graph_def` with float
+    constants. Graphs without quantized weights are returned unchanged."""
+    nodes = {node.name: node for node in graph_def.node}
+    quantized = set(
+        name[: -len(VALUES_SUFFIX)] for name in nodes if name.endswith(VALUES_SUFFIX)
+    )
+    if not quantized:
+        return graph_def
+
+    helpers = set(
+        name + suffix
+        for name in quantized
+        for suffix in (VALUES_SUFFIX, SCALES_SUFFIX, CAST_SUFFIX)
+    )
+
+    output = _copy_without_nodes(graph_def)
+    for node in graph_def.node:
+        if node.name in helpers:
+            continue
+        if node.name in quantized:
+            values = tensor_util.MakeNdarray(
+                nodes[node.name + VALUES_SUFFIX].attr["value"].tensor
+            )
+            scales = tensor_util.MakeNdarray(
+                nodes[node.name + SCALES_SUFFIX].attr["value"].tensor
+            )
+            node = _const_node(
+                node.name, values.astype(np.float32) * scales, node.device
+            )
+        output.node.extend([node])
+
+    return output
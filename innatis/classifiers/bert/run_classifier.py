@@ -18,9 +18,16 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
+import multiprocessing
 import re
+import numpy as np
 from innatis.classifiers.bert.optimization import create_optimizer
-from innatis.classifiers.bert.tokenization import convert_to_unicode, FullTokenizer
+from innatis.classifiers.bert.tokenization import (
+    convert_to_unicode,
+    FullTokenizer,
+    COMPILED_VOCAB_SUFFIX,
+)
 from innatis.classifiers.bert.modeling import BertModel
 
 import tensorflow as tf
@@ -402,7 +409,12 @@ def create_tokenizer_from_hub_module(bert_tfhub_module_handle):
             vocab_file, do_lower_case = sess.run(
                 [tokenization_info["vocab_file"], tokenization_info["do_lower_case"]]
             )
-    return FullTokenizer(vocab_file=vocab_file, do_lower_case=do_lower_case)
+    vocab_file = convert_to_unicode(vocab_file)
+    return FullTokenizer(
+        vocab_file=vocab_file,
+        do_lower_case=do_lower_case,
+        compiled_vocab_file=vocab_file + COMPILED_VOCAB_SUFFIX,
+    )
 
 
 #
@@ -411,6 +423,12 @@ def create_tokenizer_from_hub_module(bert_tfhub_module_handle):
 
 
 def serving_input_fn_builder(max_seq_length):
+    """Creates a `serving_input_fn` for exporting the model.
+
+    Pass `max_seq_length=None` to export a model that accepts inputs of any
+    sequence length, e.g. padded per batch to a length bucket.
+    """
+
     def serving_input_fn():
         label_ids = tf.placeholder(tf.int32, [None], name="label_ids")
         input_ids = tf.placeholder(tf.int32, [None, max_seq_length], name="input_ids")
@@ -458,22 +476,19 @@ def _truncate_seq_pair(tokens_a, tokens_b, max_length):
 def input_fn_builder(features, seq_length, is_training, drop_remainder):
     """Creates an `input_fn` closure to be passed to TPUEstimator."""
 
-    all_input_ids = []
-    all_input_mask = []
-    all_segment_ids = []
-    all_label_ids = []
+    return array_input_fn_builder(
+        features_to_arrays(features, seq_length), seq_length, is_training, drop_remainder
+    )
+
 
-    for feature in features:
-        all_input_ids.append(feature.input_ids)
-        all_input_mask.append(feature.input_mask)
-        all_segment_ids.append(feature.segment_ids)
-        all_label_ids.append(feature.label_id)
+def array_input_fn_builder(arrays, seq_length, is_training, drop_remainder):
+    """Creates an `input_fn` closure from the arrays of `features_to_arrays`."""
 
     def input_fn(params):
         """The actual input function."""
         batch_size = params["batch_size"]
 
-        num_examples = len(features)
+        num_examples = len(arrays["label_ids"])
 
         # This is for demo purposes and does NOT scale to large data sets. We do
         # not use Dataset.from_generator() because that uses tf.py_func which is
@@ -481,16 +496,24 @@ def input_fn_builder(features, seq_length, is_training, drop_remainder):
         d = tf.data.Dataset.from_tensor_slices(
             {
                 "input_ids": tf.constant(
-                    all_input_ids, shape=[num_examples, seq_length], dtype=tf.int32
+                    np.asarray(arrays["input_ids"], dtype=np.int32),
+                    shape=[num_examples, seq_length],
+                    dtype=tf.int32,
                 ),
                 "input_mask": tf.constant(
-                    all_input_mask, shape=[num_examples, seq_length], dtype=tf.int32
+                    np.asarray(arrays["input_mask"], dtype=np.int32),
+                    shape=[num_examples, seq_length],
+                    dtype=tf.int32,
                 ),
                 "segment_ids": tf.constant(
-                    all_segment_ids, shape=[num_examples, seq_length], dtype=tf.int32
+                    np.asarray(arrays["segment_ids"], dtype=np.int32),
+                    shape=[num_examples, seq_length],
+                    dtype=tf.int32,
                 ),
                 "label_ids": tf.constant(
-                    all_label_ids, shape=[num_examples], dtype=tf.int32
+                    np.asarray(arrays["label_ids"], dtype=np.int32),
+                    shape=[num_examples],
+                    dtype=tf.int32,
                 ),
             }
         )
@@ -505,8 +528,115 @@ def input_fn_builder(features, seq_length, is_training, drop_remainder):
     return input_fn
 
 
-def convert_examples_to_features(examples, label_list, max_seq_length, tokenizer):
-    """Convert a set of `InputExample`s to a list of `InputFeatures`."""
+def create_int_feature(values):
+    return tf.train.Feature(
+        int64_list=tf.train.Int64List(value=np.asarray(values).tolist())
+    )
+
+
+def write_arrays_to_tfrecords(arrays, output_files):
+    """Writes the `features_to_arrays` dict round-robin into TFRecord shards."""
+
+    writers = [tf.python_io.TFRecordWriter(output_file) for output_file in output_files]
+    for i in range(len(arrays["label_ids"])):
+        features = collections.OrderedDict()
+        features["input_ids"] = create_int_feature(arrays["input_ids"][i])
+        features["input_mask"] = create_int_feature(arrays["input_mask"][i])
+        features["segment_ids"] = create_int_feature(arrays["segment_ids"][i])
+        features["label_ids"] = create_int_feature([arrays["label_ids"][i]])
+
+        tf_example = tf.train.Example(features=tf.train.Features(feature=features))
+        writers[i % len(writers)].write(tf_example.SerializeToString())
+
+    for writer in writers:
+        writer.close()
+
+
+def file_based_input_fn_builder(
+    input_files,
+    seq_length,
+    is_training,
+    drop_remainder,
+    shuffle_buffer_size=10000,
+    num_parallel_calls=4,
+):
+    """Creates an `input_fn` closure that streams features from TFRecords."""
+
+    name_to_features = {
+        "input_ids": tf.FixedLenFeature([seq_length], tf.int64),
+        "input_mask": tf.FixedLenFeature([seq_length], tf.int64),
+        "segment_ids": tf.FixedLenFeature([seq_length], tf.int64),
+        "label_ids": tf.FixedLenFeature([], tf.int64),
+    }
+
+    def _decode_records(records):
+        """Decodes a batch of records to a dict of int32 tensors."""
+        examples = tf.parse_example(records, name_to_features)
+
+        # tf.Example only supports tf.int64, but the model expects tf.int32.
+        return {name: tf.to_int32(t) for name, t in examples.items()}
+
+    def input_fn(params):
+        """The actual input function."""
+        batch_size = params["batch_size"]
+
+        d = tf.data.TFRecordDataset(
+            input_files, num_parallel_reads=min(num_parallel_calls, len(input_files))
+        )
+
+        if is_training:
+            d = d.repeat()
+            d = d.shuffle(buffer_size=shuffle_buffer_size)
+
+        # Batch the serialized records first, so that each parse call decodes
+        # a whole batch.
+        d = d.batch(batch_size=batch_size, drop_remainder=drop_remainder)
+        d = d.map(_decode_records, num_parallel_calls=num_parallel_calls)
+        d = d.prefetch(buffer_size=1)
+        return d
+
+    return input_fn
+
+
+def features_to_arrays(features, seq_length):
+    """Stacks a list of `InputFeatures` into compact NumPy arrays.
+
+    Returns a dict with `input_ids` (int32) and `input_mask`, `segment_ids`
+    (int8) of shape [num_features, seq_length] and `label_ids` (int32) of
+    shape [num_features].
+    """
+    num_features = len(features)
+    arrays = {
+        "input_ids": np.zeros([num_features, seq_length], dtype=np.int32),
+        "input_mask": np.zeros([num_features, seq_length], dtype=np.int8),
+        "segment_ids": np.zeros([num_features, seq_length], dtype=np.int8),
+        "label_ids": np.zeros([num_features], dtype=np.int32),
+    }
+    for (i, feature) in enumerate(features):
+        arrays["input_ids"][i] = feature.input_ids
+        arrays["input_mask"][i] = feature.input_mask
+        arrays["segment_ids"][i] = feature.segment_ids
+        arrays["label_ids"][i] = feature.label_id
+    return arrays
+
+
+def convert_examples_to_features(
+    examples, label_list, max_seq_length, tokenizer, num_workers=1
+):
+    """Convert a set of `InputExample`s to a list of `InputFeatures`.
+
+    With `num_workers` > 1 the examples are converted in chunks by a pool of
+    forked processes, which share the already loaded tokenizer.
+    """
+    if (
+        num_workers > 1
+        and len(examples) > 1
+        and "fork" in multiprocessing.get_all_start_methods()
+    ):
+        return _convert_examples_in_parallel(
+            examples, label_list, max_seq_length, tokenizer, num_workers
+        )
+
     features = []
     for (ex_index, example) in enumerate(examples):
         feature = convert_single_example(
@@ -514,3 +644,47 @@ def convert_examples_to_features(examples, label_list, max_seq_length, tokenizer
         )
         features.append(feature)
     return features
+
+
+# Set right before the worker pool is forked, so that the workers inherit the
+# examples and the tokenizer instead of receiving them pickled.
+_worker_args = None
+
+
+def _convert_examples_chunk(bounds):
+    start, end = bounds
+    examples, label_list, max_seq_length, tokenizer = _worker_args
+    return [
+        convert_single_example(
+            ex_index, examples[ex_index], label_list, max_seq_length, tokenizer
+        )
+        for ex_index in range(start, end)
+    ]
+
+
+def _convert_examples_in_parallel(
+    examples, label_list, max_seq_length, tokenizer, num_workers
+):
+    global _worker_args
+
+    num_chunks = min(len(examples), num_workers * 4)
+    chunk_size = -(-len(examples) // num_chunks)
+    chunks = [
+        (start, min(start + chunk_size, len(examples)))
+        for start in range(0, len(examples), chunk_size)
+    ]
+
+    _worker_args = (examples, label_list, max_seq_length, tokenizer)
+    try:
+        pool = multiprocessing.get_context("fork").Pool(num_workers)
+        try:
+            # `map` returns the chunks in order, so the features stay aligned
+            # with the examples.
+            chunk_features = pool.map(_convert_examples_chunk, chunks)
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        _worker_args = None
+
+    return [feature for features in chunk_features for feature in features]
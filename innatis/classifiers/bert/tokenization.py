@@ -19,6 +19,8 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
+import functools
+import os
 import re
 import unicodedata
 import six
@@ -137,6 +139,53 @@ def load_vocab(vocab_file):
     return vocab
 
 
+# First line of a vocab written by `compile_vocab`
+COMPILED_VOCAB_HEADER = b"innatis-compiled-vocab-v1\n"
+
+# Appended to the vocab file name for the compiled vocab kept next to it
+COMPILED_VOCAB_SUFFIX = ".compiled"
+
+
+def compile_vocab(vocab_file, compiled_vocab_file):
+    """Writes the vocab in a format that `load_compiled_vocab` reads at once.
+
+    The compiled vocab holds the stripped tokens in id order, joined by
+    newlines, after `COMPILED_VOCAB_HEADER`.
+    """
+    with tf.gfile.GFile(vocab_file, "r") as reader:
+        tokens = convert_to_unicode(reader.read()).split("\n")
+    # Like `load_vocab`, ignore the newline at the end of the file
+    if tokens and not tokens[-1]:
+        tokens.pop()
+
+    data = COMPILED_VOCAB_HEADER + "\n".join(t.strip() for t in tokens).encode("utf-8")
+
+    # Write to a temporary file first, so that concurrent readers never see
+    # a partially written vocab.
+    tmp_file = "{}.tmp-{}".format(compiled_vocab_file, os.getpid())
+    with tf.gfile.GFile(tmp_file, "wb") as writer:
+        writer.write(data)
+    tf.gfile.Rename(tmp_file, compiled_vocab_file, overwrite=True)
+
+
+def load_compiled_vocab(compiled_vocab_file):
+    """Loads a vocab written by `compile_vocab` with a single read.
+
+    Returns the token to id dict and the id to token list.
+    """
+    with tf.gfile.GFile(compiled_vocab_file, "rb") as reader:
+        data = reader.read()
+
+    if not data.startswith(COMPILED_VOCAB_HEADER):
+        raise ValueError(
+            "'{}' is not a compiled vocab file.".format(compiled_vocab_file)
+        )
+
+    inv_vocab = data[len(COMPILED_VOCAB_HEADER) :].decode("utf-8").split("\n")
+    vocab = dict(zip(inv_vocab, range(len(inv_vocab))))
+    return vocab, inv_vocab
+
+
 def convert_by_vocab(vocab, items):
     """Converts a sequence of [tokens|ids] using the vocab."""
     output = []
@@ -162,15 +211,59 @@ def whitespace_tokenize(text):
     return tokens
 
 
+def _is_up_to_date(target_file, source_file):
+    """Whether `target_file` exists and is newer than `source_file`."""
+    if not tf.gfile.Exists(target_file):
+        return False
+    if not source_file or not tf.gfile.Exists(source_file):
+        return True
+    target_mtime = tf.gfile.Stat(target_file).mtime_nsec
+    return target_mtime >= tf.gfile.Stat(source_file).mtime_nsec
+
+
 class FullTokenizer(object):
     """Runs end-to-end tokenziation."""
 
-    def __init__(self, vocab_file, do_lower_case=True):
-        self.vocab = load_vocab(vocab_file)
-        self.inv_vocab = {v: k for k, v in self.vocab.items()}
+    def __init__(self, vocab_file, do_lower_case=True, compiled_vocab_file=None):
+        """Constructs a FullTokenizer.
+
+    Args:
+      vocab_file: The `vocab.txt` file, one token per line.
+      do_lower_case: Whether to lower case the input.
+      compiled_vocab_file: (optional) Path of a `compile_vocab` version of
+        `vocab_file`, which loads much faster. It is read instead of
+        `vocab_file` if it is up to date, and (re)written otherwise.
+    """
+        self.vocab_file = vocab_file
+        self.do_lower_case = do_lower_case
+
+        if compiled_vocab_file:
+            if not _is_up_to_date(compiled_vocab_file, vocab_file):
+                try:
+                    compile_vocab(vocab_file, compiled_vocab_file)
+                except tf.errors.OpError as e:
+                    tf.logging.warning(
+                        "Could not write compiled vocab %s: %s", compiled_vocab_file, e
+                    )
+                    compiled_vocab_file = None
+
+        self.compiled_vocab_file = compiled_vocab_file
+        if compiled_vocab_file:
+            self.vocab, self.inv_vocab = load_compiled_vocab(compiled_vocab_file)
+        else:
+            self.vocab = load_vocab(vocab_file)
+            self.inv_vocab = {v: k for k, v in self.vocab.items()}
+
         self.basic_tokenizer = BasicTokenizer(do_lower_case=do_lower_case)
         self.wordpiece_tokenizer = WordpieceTokenizer(vocab=self.vocab)
 
+    def save_compiled_vocab(self, compiled_vocab_file):
+        """Writes the vocab of this tokenizer in the `compile_vocab` format."""
+        if self.compiled_vocab_file:
+            tf.gfile.Copy(self.compiled_vocab_file, compiled_vocab_file, overwrite=True)
+        else:
+            compile_vocab(self.vocab_file, compiled_vocab_file)
+
     def tokenize(self, text):
         split_tokens = []
         for token in self.basic_tokenizer.tokenize(text):
@@ -186,6 +279,20 @@ class FullTokenizer(object):
         return convert_by_vocab(self.inv_vocab, ids)
 
 
+_NON_ASCII_RE = re.compile(r"[^\x00-\x7f]")
+
+# What `BasicTokenizer._clean_text` does to ASCII text: control characters are
+# removed, while tabs and newlines count as whitespace.
+_ASCII_CLEAN_TABLE = {cp: None for cp in list(range(0x20)) + [0x7F]}
+_ASCII_CLEAN_TABLE.update({ord(char): " " for char in "\t\n\r"})
+
+# The ASCII characters for which `_is_punctuation` is true
+_ASCII_PUNCTUATION = r"!-/:-@\[-`{-~"
+
+# A single punctuation character, or a run of anything else but spaces
+_ASCII_TOKEN_RE = re.compile(r"[{0}]|[^ {0}]+".format(_ASCII_PUNCTUATION))
+
+
 class BasicTokenizer(object):
     """Runs basic tokenization (punctuation splitting, lower casing, etc.)."""
 
@@ -197,9 +304,30 @@ class BasicTokenizer(object):
     """
         self.do_lower_case = do_lower_case
 
+        _build_bmp_char_classes()
+
     def tokenize(self, text):
         """Tokenizes a piece of text."""
         text = convert_to_unicode(text)
+        if _NON_ASCII_RE.search(text) is None:
+            return self._tokenize_ascii(text)
+        return self._tokenize_unicode(text)
+
+    def _tokenize_ascii(self, text):
+        """Fast path for ASCII-only text, with the same output as
+        `_tokenize_unicode`.
+
+        For ASCII, cleaning only drops control characters and turns tabs and
+        newlines into spaces, there are no accents or CJK characters, and the
+        punctuation is exactly `_ASCII_PUNCTUATION`.
+        """
+        text = text.translate(_ASCII_CLEAN_TABLE)
+        if self.do_lower_case:
+            text = text.lower()
+        return _ASCII_TOKEN_RE.findall(text)
+
+    def _tokenize_unicode(self, text):
+        """Tokenizes a piece of unicode text."""
         text = self._clean_text(text)
 
         # This was added on November 1st, 2018 for the multilingual and Chinese
@@ -226,8 +354,7 @@ class BasicTokenizer(object):
         text = unicodedata.normalize("NFD", text)
         output = []
         for char in text:
-            cat = unicodedata.category(char)
-            if cat == "Mn":
+            if _codepoint_class(ord(char)) & _NONSPACING_MARK:
                 continue
             output.append(char)
         return "".join(output)
@@ -267,36 +394,17 @@ class BasicTokenizer(object):
 
     def _is_chinese_char(self, cp):
         """Checks whether CP is the codepoint of a CJK character."""
-        # This defines a "chinese character" as anything in the CJK Unicode block:
-        #   https://en.wikipedia.org/wiki/CJK_Unified_Ideographs_(Unicode_block)
-        #
-        # Note that the CJK Unicode block is NOT all Japanese and Korean characters,
-        # despite its name. The modern Korean Hangul alphabet is a different block,
-        # as is Japanese Hiragana and Katakana. Those alphabets are used to write
-        # space-separated words, so they are not treated specially and handled
-        # like the all of the other languages.
-        if (
-            (cp >= 0x4E00 and cp <= 0x9FFF)
-            or (cp >= 0x3400 and cp <= 0x4DBF)  #
-            or (cp >= 0x20000 and cp <= 0x2A6DF)  #
-            or (cp >= 0x2A700 and cp <= 0x2B73F)  #
-            or (cp >= 0x2B740 and cp <= 0x2B81F)  #
-            or (cp >= 0x2B820 and cp <= 0x2CEAF)  #
-            or (cp >= 0xF900 and cp <= 0xFAFF)
-            or (cp >= 0x2F800 and cp <= 0x2FA1F)  #
-        ):  #
-            return True
-
-        return False
+        return bool(_codepoint_class(cp) & _CHINESE)
 
     def _clean_text(self, text):
         """Performs invalid character removal and whitespace cleanup on text."""
         output = []
         for char in text:
             cp = ord(char)
-            if cp == 0 or cp == 0xFFFD or _is_control(char):
+            flags = _codepoint_class(cp)
+            if cp == 0 or cp == 0xFFFD or flags & _CONTROL:
                 continue
-            if _is_whitespace(char):
+            if flags & _WHITESPACE:
                 output.append(" ")
             else:
                 output.append(char)
@@ -306,11 +414,31 @@ class BasicTokenizer(object):
 class WordpieceTokenizer(object):
     """Runs WordPiece tokenziation."""
 
-    def __init__(self, vocab, unk_token="[UNK]", max_input_chars_per_word=200):
+    def __init__(
+        self,
+        vocab,
+        unk_token="[UNK]",
+        max_input_chars_per_word=200,
+        word_cache_size=10000,
+    ):
         self.vocab = vocab
         self.unk_token = unk_token
         self.max_input_chars_per_word = max_input_chars_per_word
 
+        # Character tries of the vocab, one for the piece at the start of a
+        # word and one for the "##" pieces, which are stored without "##".
+        self._start_trie = _build_trie(vocab)
+        self._suffix_trie = _build_trie(
+            token[2:] for token in vocab if token.startswith("##") and len(token) > 2
+        )
+
+        if word_cache_size:
+            self._tokenize_word = functools.lru_cache(maxsize=word_cache_size)(
+                self._tokenize_word_uncached
+            )
+        else:
+            self._tokenize_word = self._tokenize_word_uncached
+
     def tokenize(self, text):
         """Tokenizes a piece of text into its word pieces.
 
@@ -333,39 +461,154 @@ class WordpieceTokenizer(object):
 
         output_tokens = []
         for token in whitespace_tokenize(text):
-            chars = list(token)
-            if len(chars) > self.max_input_chars_per_word:
-                output_tokens.append(self.unk_token)
-                continue
+            output_tokens.extend(self._tokenize_word(token))
+        return output_tokens
 
-            is_bad = False
-            start = 0
-            sub_tokens = []
-            while start < len(chars):
-                end = len(chars)
-                cur_substr = None
-                while start < end:
-                    substr = "".join(chars[start:end])
-                    if start > 0:
-                        substr = "##" + substr
-                    if substr in self.vocab:
-                        cur_substr = substr
-                        break
-                    end -= 1
-                if cur_substr is None:
-                    is_bad = True
-                    break
-                sub_tokens.append(cur_substr)
-                start = end
-
-            if is_bad:
-                output_tokens.append(self.unk_token)
+    def _tokenize_word_uncached(self, word):
+        """Tokenizes a single word, returning a tuple of word pieces."""
+        if len(word) > self.max_input_chars_per_word:
+            return (self.unk_token,)
+
+        start = 0
+        trie = self._start_trie
+        sub_tokens = []
+        while start < len(word):
+            end = _longest_trie_match(trie, word, start)
+            if end is None:
+                return (self.unk_token,)
+            if start > 0:
+                sub_tokens.append("##" + word[start:end])
             else:
-                output_tokens.extend(sub_tokens)
-        return output_tokens
+                sub_tokens.append(word[start:end])
+            start = end
+            trie = self._suffix_trie
+
+        return tuple(sub_tokens)
+
+
+# Marks the trie nodes at which a vocab entry ends
+_TRIE_END = None
+
+
+def _build_trie(tokens):
+    """Builds a character trie of nested dicts from `tokens`."""
+    root = {}
+    for token in tokens:
+        node = root
+        for char in token:
+            node = node.setdefault(char, {})
+        node[_TRIE_END] = True
+    return root
+
+
+def _longest_trie_match(trie, word, start):
+    """Returns the end of the longest non-empty entry of `trie` that matches
+    `word` at `start`, or `None` if there is none."""
+    node = trie
+    end = None
+    for i in range(start, len(word)):
+        node = node.get(word[i])
+        if node is None:
+            break
+        if _TRIE_END in node:
+            end = i + 1
+    return end
 
 
 def _is_whitespace(char):
+    """Checks whether `chars` is a whitespace character."""
+    return bool(_codepoint_class(ord(char)) & _WHITESPACE)
+
+
+def _is_control(char):
+    """Checks whether `chars` is a control character."""
+    return bool(_codepoint_class(ord(char)) & _CONTROL)
+
+
+def _is_punctuation(char):
+    """Checks whether `chars` is a punctuation character."""
+    return bool(_codepoint_class(ord(char)) & _PUNCTUATION)
+
+
+# Flags of the character class lookup table. Each predicate costs one table
+# lookup instead of `unicodedata.category` calls and range comparisons.
+_WHITESPACE = 1
+_CONTROL = 2
+_PUNCTUATION = 4
+_CHINESE = 8
+_NONSPACING_MARK = 16
+_UNKNOWN = 0xFF
+
+# Flags of every codepoint in the Basic Multilingual Plane. Entries start out
+# as `_UNKNOWN` and are all filled in when the first tokenizer is created.
+_BMP_CHAR_CLASSES = bytearray([_UNKNOWN]) * 0x10000
+
+
+def _build_bmp_char_classes():
+    """Fills `_BMP_CHAR_CLASSES`, once per process."""
+    if _UNKNOWN in _BMP_CHAR_CLASSES:
+        _BMP_CHAR_CLASSES[:] = bytearray(
+            _compute_char_class(cp) for cp in range(0x10000)
+        )
+
+
+def _codepoint_class(cp):
+    if cp < 0x10000:
+        flags = _BMP_CHAR_CLASSES[cp]
+        if flags == _UNKNOWN:
+            flags = _BMP_CHAR_CLASSES[cp] = _compute_char_class(cp)
+        return flags
+    return _astral_codepoint_class(cp)
+
+
+@functools.lru_cache(maxsize=4096)
+def _astral_codepoint_class(cp):
+    """The rare codepoints outside the BMP are classified on demand."""
+    return _compute_char_class(cp)
+
+
+def _compute_char_class(cp):
+    char = six.unichr(cp)
+    flags = 0
+    if _compute_is_whitespace(char):
+        flags |= _WHITESPACE
+    if _compute_is_control(char):
+        flags |= _CONTROL
+    if _compute_is_punctuation(char):
+        flags |= _PUNCTUATION
+    if _compute_is_chinese_char(cp):
+        flags |= _CHINESE
+    if unicodedata.category(char) == "Mn":
+        flags |= _NONSPACING_MARK
+    return flags
+
+
+def _compute_is_chinese_char(cp):
+    """Checks whether CP is the codepoint of a CJK character."""
+    # This defines a "chinese character" as anything in the CJK Unicode block:
+    #   https://en.wikipedia.org/wiki/CJK_Unified_Ideographs_(Unicode_block)
+    #
+    # Note that the CJK Unicode block is NOT all Japanese and Korean characters,
+    # despite its name. The modern Korean Hangul alphabet is a different block,
+    # as is Japanese Hiragana and Katakana. Those alphabets are used to write
+    # space-separated words, so they are not treated specially and handled
+    # like the all of the other languages.
+    if (
+        (cp >= 0x4E00 and cp <= 0x9FFF)
+        or (cp >= 0x3400 and cp <= 0x4DBF)  #
+        or (cp >= 0x20000 and cp <= 0x2A6DF)  #
+        or (cp >= 0x2A700 and cp <= 0x2B73F)  #
+        or (cp >= 0x2B740 and cp <= 0x2B81F)  #
+        or (cp >= 0x2B820 and cp <= 0x2CEAF)  #
+        or (cp >= 0xF900 and cp <= 0xFAFF)
+        or (cp >= 0x2F800 and cp <= 0x2FA1F)  #
+    ):  #
+        return True
+
+    return False
+
+
+def _compute_is_whitespace(char):
     """Checks whether `chars` is a whitespace character."""
     # \t, \n, and \r are technically contorl characters but we treat them
     # as whitespace since they are generally considered as such.
@@ -377,7 +620,7 @@ def _is_whitespace(char):
     return False
 
 
-def _is_control(char):
+def _compute_is_control(char):
     """Checks whether `chars` is a control character."""
     # These are technically control characters but we count them as whitespace
     # characters.
@@ -389,7 +632,7 @@ def _is_control(char):
     return False
 
 
-def _is_punctuation(char):
+def _compute_is_punctuation(char):
     """Checks whether `chars` is a punctuation character."""
     cp = ord(char)
     # We treat all non-letter/number ASCII as punctuation.
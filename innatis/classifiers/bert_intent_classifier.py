@@ -1,7 +1,10 @@
 import io
+import json
 import os
 import pickle
-from typing import Any, Optional, Dict, Text
+import threading
+import time
+from typing import Any, Optional, Dict, List, Text, Tuple
 import numpy as np
 import shutil
 
@@ -16,12 +19,33 @@ from innatis.classifiers.bert.run_classifier import (
     get_train_examples,
     convert_examples_to_features,
     model_fn_builder,
-    input_fn_builder,
+    array_input_fn_builder,
+    features_to_arrays,
+    file_based_input_fn_builder,
+    write_arrays_to_tfrecords,
     serving_input_fn_builder,
     get_test_examples,
+    InputExample,
+    InputFeatures,
+)
+from innatis.classifiers.bert.distillation import (
+    distillation_input_fn_builder,
+    distillation_model_fn_builder,
+    student_bert_config,
+)
+from innatis.classifiers.bert.feature_cache import load_or_convert_features
+from innatis.classifiers.bert.inference_graph import (
+    FrozenGraphPredictor,
+    compare_exports,
+    freeze_saved_model,
+)
+from innatis.classifiers.bert.quantization import quantize_graph_def
+from innatis.classifiers.bert.tokenization import (
+    FullTokenizer,
+    COMPILED_VOCAB_SUFFIX,
 )
-from innatis.classifiers.bert.tokenization import FullTokenizer
 from innatis.classifiers.bert.modeling import BertConfig
+from innatis.classifiers.request_coalescer import RequestCoalescer
 import logging
 
 logger = logging.getLogger(__name__)
@@ -47,6 +71,45 @@ class BertIntentClassifier(Component):
         "pretrained_model_dir": None,
         "checkpoint_dir": "./tmp/bert",
         "checkpoint_remove_before_training": True,
+        # Tokenized training features are cached here between runs
+        "feature_cache_dir": None,
+        # Number of processes converting training examples to features
+        "tokenization_workers": 1,
+        # Training sets with at least this many examples are streamed from
+        # TFRecord files instead of being embedded in the graph
+        "tfrecord_min_examples": 50000,
+        "tfrecord_num_shards": 8,
+        "shuffle_buffer_size": 10000,
+        "input_num_parallel_calls": 4,
+        "predict_batch_size": 64,
+        "coalesce_requests": False,
+        "coalesce_max_wait_ms": 5,
+        "sequence_length_buckets": None,
+        # Number of intents in `intent_ranking`, 0 to rank all of them
+        "intent_ranking_length": 0,
+        # Intents below this confidence are left out of `intent_ranking`
+        "intent_ranking_min_confidence": 0.0,
+        # Also export a frozen inference-only graph, which `load` then uses
+        "export_frozen_graph": False,
+        # Store the BERT weights of the frozen graph as int8, implies
+        # `export_frozen_graph`
+        "quantize": False,
+        # Share of the training examples held out to measure the accuracy
+        # lost by quantization
+        "quantize_holdout_fraction": 0.1,
+        # Directory of a trained model containing a BertIntentClassifier.
+        # If set, a smaller student model is trained on its soft targets.
+        "teacher_model_dir": None,
+        # `BertConfig` parameters of the student, e.g. `num_hidden_layers`
+        # and `hidden_size`, on top of the pretrained model's config
+        "student_config": None,
+        "distillation_temperature": 2.0,
+        # Weight of the teacher's soft targets against the true labels
+        "distillation_alpha": 0.5,
+        # Thread pool sizes of this component's sessions, 0 lets
+        # TensorFlow pick
+        "intra_op_parallelism_threads": 0,
+        "inter_op_parallelism_threads": 0,
     }
 
     def _load_bert_params(self, config: Dict[Text, Any]) -> None:
@@ -54,7 +117,10 @@ class BertIntentClassifier(Component):
         self.pretrained_model_dir = config["pretrained_model_dir"]
 
         if self.pretrained_model_dir:
-            dir_files = os.listdir(self.pretrained_model_dir)
+            if os.path.isdir(self.pretrained_model_dir):
+                dir_files = os.listdir(self.pretrained_model_dir)
+            else:
+                dir_files = []
             if all(file not in dir_files for file in ("bert_config.json", "vocab.txt")):
                 logger.warning(
                     "Pretrained model dir configured as '{}' "
@@ -81,10 +147,42 @@ class BertIntentClassifier(Component):
         self.checkpoint_remove_before_training = config[
             "checkpoint_remove_before_training"
         ]
+        self.feature_cache_dir = config["feature_cache_dir"]
+        self.tokenization_workers = config["tokenization_workers"]
+        self.tfrecord_min_examples = config["tfrecord_min_examples"]
+        self.tfrecord_num_shards = config["tfrecord_num_shards"]
+        self.shuffle_buffer_size = config["shuffle_buffer_size"]
+        self.input_num_parallel_calls = config["input_num_parallel_calls"]
+        self.teacher_model_dir = config["teacher_model_dir"]
+        self.student_config = config["student_config"]
+        self.distillation_temperature = config["distillation_temperature"]
+        self.distillation_alpha = config["distillation_alpha"]
+
+    def _load_predict_params(self, config: Dict[Text, Any]) -> None:
+        self.predict_batch_size = config["predict_batch_size"]
+        self.coalesce_requests = config["coalesce_requests"]
+        self.coalesce_max_wait_ms = config["coalesce_max_wait_ms"]
+        self.intent_ranking_length = config["intent_ranking_length"]
+        self.intent_ranking_min_confidence = config["intent_ranking_min_confidence"]
+        self.quantize = config["quantize"]
+        self.quantize_holdout_fraction = config["quantize_holdout_fraction"]
+        self.export_frozen_graph = config["export_frozen_graph"] or self.quantize
+
+        # Inference pads each message only up to the smallest bucket that fits
+        # it instead of `max_seq_length`. The model is then exported with a
+        # variable sequence length.
+        buckets = config["sequence_length_buckets"]
+        if buckets:
+            self.sequence_length_buckets = sorted(
+                set(b for b in buckets if b < self.max_seq_length)
+            ) + [self.max_seq_length]
+        else:
+            self.sequence_length_buckets = None
 
     def _load_params(self) -> None:
         self._load_bert_params(self.component_config)
         self._load_train_params(self.component_config)
+        self._load_predict_params(self.component_config)
 
     def __init__(
         self,
@@ -92,25 +190,35 @@ class BertIntentClassifier(Component):
         session: Optional["tf.Session"] = None,
         label_list: Optional[np.ndarray] = None,
         predict_fn: Optional["Predictor"] = None,
+        tokenizer: Optional[FullTokenizer] = None,
+        graph: Optional["tf.Graph"] = None,
     ) -> None:
         super(BertIntentClassifier, self).__init__(component_config)
 
         tf.logging.set_verbosity(tf.logging.INFO)
 
+        # Each component has its own graph and thread pools, so that
+        # several models in one process do not get in each other's way
+        self.graph = graph or tf.Graph()
+        self.session_config = self._session_config(self.component_config)
         self.session = session
         self.label_list = label_list
         self.predict_fn = predict_fn
 
         self._load_params()
 
-        if self.pretrained_model_dir:
+        if tokenizer:
+            self.tokenizer = tokenizer
+        elif self.pretrained_model_dir:
             vocab_file = os.path.join(self.pretrained_model_dir, "vocab.txt")
             do_lower_case = os.path.basename(self.pretrained_model_dir).startswith(
                 "uncased"
             )
 
             self.tokenizer = FullTokenizer(
-                vocab_file=vocab_file, do_lower_case=do_lower_case
+                vocab_file=vocab_file,
+                do_lower_case=do_lower_case,
+                compiled_vocab_file=vocab_file + COMPILED_VOCAB_SUFFIX,
             )
         else:
             self.tokenizer = create_tokenizer_from_hub_module(
@@ -118,6 +226,31 @@ class BertIntentClassifier(Component):
             )
 
         self.estimator = None
+        self.holdout_examples = []
+
+        self.bucket_latency = {}
+        self._bucket_latency_lock = threading.Lock()
+
+        # Serving mode: concurrent `process` calls are queued and classified
+        # together by a background worker.
+        if self.coalesce_requests:
+            self.coalescer = RequestCoalescer(
+                self.process_batch,
+                max_batch_size=self.predict_batch_size,
+                max_wait_ms=self.coalesce_max_wait_ms,
+            )
+        else:
+            self.coalescer = None
+
+    @staticmethod
+    def _session_config(config: Dict[Text, Any]) -> "tf.ConfigProto":
+        # Without per session threads the first session in the process sizes
+        # the thread pools of all of them
+        return tf.ConfigProto(
+            intra_op_parallelism_threads=config.get("intra_op_parallelism_threads", 0),
+            inter_op_parallelism_threads=config.get("inter_op_parallelism_threads", 0),
+            use_per_session_threads=True,
+        )
 
     def train(self, training_data, cfg, **kwargs):
         """Train this component."""
@@ -134,9 +267,14 @@ class BertIntentClassifier(Component):
             model_dir=self.checkpoint_dir,
             save_summary_steps=self.save_summary_steps,
             save_checkpoints_steps=self.save_checkpoints_steps,
+            session_config=self.session_config,
         )
 
         train_examples = get_train_examples(training_data.training_examples)
+        if self.quantize:
+            train_examples, self.holdout_examples = self._split_holdout(
+                train_examples
+            )
         num_train_steps = int(len(train_examples) / self.batch_size * self.epochs)
         num_warmup_steps = int(num_train_steps * self.warmup_proportion)
 
@@ -145,9 +283,24 @@ class BertIntentClassifier(Component):
         tf.logging.info("Batch size = %d", self.batch_size)
         tf.logging.info("Num steps = %d", num_train_steps)
         tf.logging.info("Num epochs = %d", self.epochs)
-        train_features = convert_examples_to_features(
-            train_examples, self.label_list, self.max_seq_length, self.tokenizer
-        )
+        if self.feature_cache_dir:
+            train_arrays = load_or_convert_features(
+                train_examples,
+                self.label_list,
+                self.max_seq_length,
+                self.tokenizer,
+                self.feature_cache_dir,
+                num_workers=self.tokenization_workers,
+            )
+        else:
+            train_features = convert_examples_to_features(
+                train_examples,
+                self.label_list,
+                self.max_seq_length,
+                self.tokenizer,
+                num_workers=self.tokenization_workers,
+            )
+            train_arrays = features_to_arrays(train_features, self.max_seq_length)
 
         if self.pretrained_model_dir:
             bert_config = BertConfig.from_json_file(
@@ -156,21 +309,36 @@ class BertIntentClassifier(Component):
         else:
             bert_config = None
 
-        model_fn = model_fn_builder(
-            bert_tfhub_module_handle=self.bert_tfhub_module_handle,
-            num_labels=len(self.label_list),
-            learning_rate=self.learning_rate,
-            num_train_steps=num_train_steps,
-            num_warmup_steps=num_warmup_steps,
-            bert_config=bert_config,
-        )
-
-        train_input_fn = input_fn_builder(
-            features=train_features,
-            seq_length=self.max_seq_length,
-            is_training=True,
-            drop_remainder=True,
-        )
+        if self.teacher_model_dir:
+            student_config = student_bert_config(
+                len(self.tokenizer.vocab), self.student_config, bert_config
+            )
+            model_fn = distillation_model_fn_builder(
+                bert_config=student_config,
+                num_labels=len(self.label_list),
+                learning_rate=self.learning_rate,
+                num_train_steps=num_train_steps,
+                num_warmup_steps=num_warmup_steps,
+                temperature=self.distillation_temperature,
+                alpha=self.distillation_alpha,
+            )
+            train_input_fn = distillation_input_fn_builder(
+                arrays=train_arrays,
+                teacher_log_probs=self._teacher_log_probs(train_examples),
+                seq_length=self.max_seq_length,
+                is_training=True,
+                drop_remainder=True,
+            )
+        else:
+            model_fn = model_fn_builder(
+                bert_tfhub_module_handle=self.bert_tfhub_module_handle,
+                num_labels=len(self.label_list),
+                learning_rate=self.learning_rate,
+                num_train_steps=num_train_steps,
+                num_warmup_steps=num_warmup_steps,
+                bert_config=bert_config,
+            )
+            train_input_fn = self._train_input_fn(train_arrays)
 
         self.estimator = tf.estimator.Estimator(
             model_fn=model_fn, config=run_config, params={"batch_size": self.batch_size}
@@ -179,58 +347,282 @@ class BertIntentClassifier(Component):
         # Start training
         self.estimator.train(input_fn=train_input_fn, max_steps=num_train_steps)
 
-        self.session = tf.Session()
+        self.graph = tf.Graph()
 
         # Create predictor incase running evaluation
         self.predict_fn = predictor.from_estimator(
-            self.estimator, serving_input_fn_builder(self.max_seq_length)
+            self.estimator,
+            serving_input_fn_builder(self._serving_seq_length()),
+            graph=self.graph,
+            config=self.session_config,
+        )
+        # The predictor runs in a session of its own on `graph`
+        self.session = self.predict_fn.session
+
+    def _teacher_log_probs(self, examples: List[InputExample]) -> np.ndarray:
+        """The teacher's `log_probs` for each training example."""
+
+        teacher = self._load_teacher()
+        if list(teacher.label_list) != list(self.label_list):
+            raise ValueError(
+                "The teacher in '{}' was trained on the intents {}, not on "
+                "{}".format(
+                    self.teacher_model_dir,
+                    list(teacher.label_list),
+                    list(self.label_list),
+                )
+            )
+
+        # The teacher tokenizes with its own vocab and sequence length
+        features = convert_examples_to_features(
+            examples,
+            teacher.label_list,
+            teacher.max_seq_length,
+            teacher.tokenizer,
+            num_workers=self.tokenization_workers,
+        )
+        log_probs = np.concatenate(
+            [
+                teacher._predict_log_probs(
+                    features[start : start + teacher.predict_batch_size]
+                )
+                for start in range(0, len(features), teacher.predict_batch_size)
+            ]
+        )
+
+        if teacher.coalescer is not None:
+            teacher.coalescer.close()
+        if teacher.session is not None:
+            teacher.session.close()
+
+        return log_probs
+
+    def _load_teacher(self) -> "BertIntentClassifier":
+        with io.open(
+            os.path.join(self.teacher_model_dir, "metadata.json"), encoding="utf-8"
+        ) as f:
+            metadata = json.load(f)
+
+        for component_meta in metadata.get("pipeline", []):
+            if component_meta.get("name") == self.name or component_meta.get(
+                "class", ""
+            ).endswith(type(self).__name__):
+                logger.info(
+                    "Distilling the intent classifier in {}"
+                    "".format(self.teacher_model_dir)
+                )
+                return self.load(component_meta, self.teacher_model_dir)
+
+        raise ValueError(
+            "No {} found in the model in '{}'".format(
+                type(self).__name__, self.teacher_model_dir
+            )
+        )
+
+    def _split_holdout(
+        self, examples: List[InputExample]
+    ) -> Tuple[List[InputExample], List[InputExample]]:
+        num_holdout = int(len(examples) * self.quantize_holdout_fraction)
+        order = np.random.RandomState(42).permutation(len(examples))
+        holdout = [examples[i] for i in sorted(order[:num_holdout])]
+        train = [examples[i] for i in sorted(order[num_holdout:])]
+        return train, holdout
+
+    def _train_input_fn(self, train_arrays: Dict[Text, np.ndarray]):
+        num_examples = len(train_arrays["label_ids"])
+
+        if num_examples < self.tfrecord_min_examples:
+            return array_input_fn_builder(
+                arrays=train_arrays,
+                seq_length=self.max_seq_length,
+                is_training=True,
+                drop_remainder=True,
+            )
+
+        # Large training sets would blow up the graph as constants, so they
+        # are written to TFRecord shards once and streamed from there.
+        tfrecord_dir = os.path.join(self.checkpoint_dir, "train_tfrecords")
+        if not os.path.isdir(tfrecord_dir):
+            os.makedirs(tfrecord_dir)
+        input_files = [
+            os.path.join(tfrecord_dir, "train-{:05d}.tfrecord".format(i))
+            for i in range(min(self.tfrecord_num_shards, num_examples))
+        ]
+
+        tf.logging.info(
+            "Writing %d examples to %d TFRecord files in %s",
+            num_examples,
+            len(input_files),
+            tfrecord_dir,
+        )
+        write_arrays_to_tfrecords(train_arrays, input_files)
+
+        return file_based_input_fn_builder(
+            input_files=input_files,
+            seq_length=self.max_seq_length,
+            is_training=True,
+            drop_remainder=True,
+            shuffle_buffer_size=self.shuffle_buffer_size,
+            num_parallel_calls=self.input_num_parallel_calls,
         )
 
     def process(self, message: Message, **kwargs: Any) -> None:
         """Return the most likely intent and its similarity to the input"""
 
-        # Classifier needs this to be non empty, so we set to first label.
-        message.data["intent"] = self.label_list[0]
+        if self.coalescer is not None:
+            self.coalescer.submit(message)
+        else:
+            self.process_batch([message])
+
+    def process_batch(self, messages: List[Message]) -> None:
+        """Classify several messages, calling the predictor once per
+        `predict_batch_size` messages instead of once per message."""
+
+        for start in range(0, len(messages), self.predict_batch_size):
+            batch = messages[start : start + self.predict_batch_size]
+
+            # Classifier needs this to be non empty, so we set to first label.
+            for message in batch:
+                message.data["intent"] = self.label_list[0]
+
+            predict_examples = get_test_examples(batch)
+            predict_features = convert_examples_to_features(
+                predict_examples, self.label_list, self.max_seq_length, self.tokenizer
+            )
+
+            probabilities = self._predict(predict_features)
+
+            for message, message_probabilities in zip(batch, probabilities):
+                self._set_intent(message, message_probabilities)
+
+    def _serving_seq_length(self) -> Optional[int]:
+        """Sequence length of the exported model, `None` when variable."""
+
+        return None if self.sequence_length_buckets else self.max_seq_length
+
+    def _bucket(self, feature: InputFeatures) -> int:
+        length = sum(feature.input_mask)
+        for bucket in self.sequence_length_buckets:
+            if length <= bucket:
+                return bucket
+        return self.max_seq_length
+
+    def _predict(self, features: List[InputFeatures]) -> np.ndarray:
+        """Return the class probabilities, one row per feature."""
+
+        return np.exp(self._predict_log_probs(features))
+
+    def _predict_log_probs(self, features: List[InputFeatures]) -> np.ndarray:
+        if not self.sequence_length_buckets:
+            return self._run_predictor(features, self.max_seq_length)
+
+        buckets = {}
+        for i, feature in enumerate(features):
+            buckets.setdefault(self._bucket(feature), []).append(i)
+
+        log_probs = [None] * len(features)
+        for seq_length, indices in sorted(buckets.items()):
+            start = time.time()
+            bucket_log_probs = self._run_predictor(
+                [features[i] for i in indices], seq_length
+            )
+            self._record_bucket_latency(seq_length, len(indices), time.time() - start)
+
+            for i, row in zip(indices, bucket_log_probs):
+                log_probs[i] = row
+
+        return np.stack(log_probs)
+
+    def _run_predictor(
+        self, features: List[InputFeatures], seq_length: int
+    ) -> np.ndarray:
+        """Run the predictor once over a batch of features, cutting the
+        padding down to `seq_length`. Returns the `log_probs`."""
+
+        result = self.predict_fn(self._predictor_inputs(features, seq_length))
+
+        return result["probabilities"]
+
+    @staticmethod
+    def _predictor_inputs(
+        features: List[InputFeatures], seq_length: int
+    ) -> Dict[Text, np.ndarray]:
+        return {
+            "input_ids": np.array(
+                [feature.input_ids[:seq_length] for feature in features],
+                dtype=np.int32,
+            ).reshape(-1, seq_length),
+            "input_mask": np.array(
+                [feature.input_mask[:seq_length] for feature in features],
+                dtype=np.int32,
+            ).reshape(-1, seq_length),
+            "label_ids": np.array(
+                [feature.label_id for feature in features], dtype=np.int32
+            ).reshape(-1),
+            "segment_ids": np.array(
+                [feature.segment_ids[:seq_length] for feature in features],
+                dtype=np.int32,
+            ).reshape(-1, seq_length),
+        }
+
+    def _record_bucket_latency(
+        self, seq_length: int, num_messages: int, seconds: float
+    ) -> None:
+        with self._bucket_latency_lock:
+            stats = self.bucket_latency.setdefault(
+                seq_length, {"batches": 0, "messages": 0, "seconds": 0.0}
+            )
+            stats["batches"] += 1
+            stats["messages"] += num_messages
+            stats["seconds"] += seconds
 
-        predict_examples = get_test_examples([message])
-        predict_features = convert_examples_to_features(
-            predict_examples, self.label_list, self.max_seq_length, self.tokenizer
+        logger.debug(
+            "Classified {} messages in bucket {} in {:.2f} ms"
+            "".format(num_messages, seq_length, seconds * 1000)
         )
 
-        # Get first index since we are only classifying text blob at a time.
-        example = predict_features[0]
-
-        result = self.predict_fn(
-            {
-                "input_ids": np.array(example.input_ids).reshape(
-                    -1, self.max_seq_length
-                ),
-                "input_mask": np.array(example.input_mask).reshape(
-                    -1, self.max_seq_length
-                ),
-                "label_ids": np.array(example.label_id).reshape(-1),
-                "segment_ids": np.array(example.segment_ids).reshape(
-                    -1, self.max_seq_length
-                ),
+    def bucket_latency_report(self) -> Dict[int, Dict[Text, float]]:
+        """Mean predictor latency per sequence length bucket so far."""
+
+        with self._bucket_latency_lock:
+            return {
+                seq_length: {
+                    "batches": stats["batches"],
+                    "messages": stats["messages"],
+                    "mean_batch_ms": stats["seconds"] * 1000 / stats["batches"],
+                }
+                for seq_length, stats in sorted(self.bucket_latency.items())
             }
-        )
 
-        probabilities = list(np.exp(result["probabilities"])[0])
-
-        with self.session.as_default():
-            index = tf.argmax(probabilities, axis=0).eval(session=tf.Session())
-            label = self.label_list[index]
-            score = float(probabilities[index])
-
-            intent = {"name": label, "confidence": score}
-            intent_ranking = sorted(
-                [
-                    {"name": self.label_list[i], "confidence": float(score)}
-                    for i, score in enumerate(probabilities)
-                ],
-                key=lambda k: k["confidence"],
-                reverse=True,
+    def _set_intent(self, message: Message, probabilities: np.ndarray) -> None:
+        # Plain NumPy on purpose: building TF ops here would grow the default
+        # graph with every message.
+        index = int(np.argmax(probabilities))
+        intent = {
+            "name": self.label_list[index],
+            "confidence": float(probabilities[index]),
+        }
+
+        # Only the top `intent_ranking_length` intents get sorted. The sort is
+        # stable, so equally likely intents keep the label order.
+        ranking_length = self.intent_ranking_length
+        if ranking_length and ranking_length < len(probabilities):
+            ranking = np.sort(
+                np.argpartition(-probabilities, ranking_length - 1)[:ranking_length]
             )
+            ranking = ranking[np.argsort(-probabilities[ranking], kind="mergesort")]
+        else:
+            ranking = np.argsort(-probabilities, kind="mergesort")
+
+        if self.intent_ranking_min_confidence:
+            ranking = ranking[
+                probabilities[ranking] >= self.intent_ranking_min_confidence
+            ]
+
+        intent_ranking = [
+            {"name": self.label_list[i], "confidence": float(probabilities[i])}
+            for i in ranking
+        ]
 
         message.set("intent", intent, add_to_output=True)
         message.set("intent_ranking", intent_ranking, add_to_output=True)
@@ -251,13 +643,175 @@ class BertIntentClassifier(Component):
                 raise
 
         model_path = self.estimator.export_savedmodel(
-            model_dir, serving_input_fn_builder(self.max_seq_length)
+            model_dir, serving_input_fn_builder(self._serving_seq_length())
         )
 
         with io.open(os.path.join(model_dir, file_name + "_label_list.pkl"), "wb") as f:
             pickle.dump(self.label_list, f)
 
-        return {"model_path": model_path.decode("UTF-8"),"file": file_name}
+        # Keep the tokenizer with the model, so that loading it needs neither
+        # the pretrained model dir nor the TF Hub module.
+        vocab_file_name = file_name + "_vocab" + COMPILED_VOCAB_SUFFIX
+        self.tokenizer.save_compiled_vocab(os.path.join(model_dir, vocab_file_name))
+
+        meta = {
+            "model_path": model_path.decode("UTF-8"),
+            "file": file_name,
+            "vocab_file": vocab_file_name,
+            "do_lower_case": bool(self.tokenizer.do_lower_case),
+        }
+
+        if self.export_frozen_graph:
+            meta.update(
+                self._persist_frozen_graph(
+                    file_name, model_dir, model_path.decode("UTF-8")
+                )
+            )
+
+        return meta
+
+    def _persist_frozen_graph(
+        self, file_name: Text, model_dir: Text, saved_model_dir: Text
+    ) -> Dict[Text, Any]:
+        frozen_graph_name = file_name + "_frozen_graph.pb"
+        frozen_graph_file = os.path.join(model_dir, frozen_graph_name)
+        signature = freeze_saved_model(saved_model_dir, frozen_graph_file)
+
+        frozen_predict_fn = FrozenGraphPredictor(
+            frozen_graph_file,
+            signature["inputs"],
+            signature["output"],
+            config=self.session_config,
+        )
+        exports = {
+            "saved_model": (saved_model_dir, self.predict_fn),
+            "frozen_graph": (frozen_graph_file, frozen_predict_fn),
+        }
+        meta = {
+            "frozen_graph": frozen_graph_name,
+            "frozen_graph_inputs": signature["inputs"],
+            "frozen_graph_output": signature["output"],
+        }
+
+        quantized = False
+        if self.quantize:
+            quantized_graph_name = file_name + "_quantized_graph.pb"
+            quantized_graph_file = os.path.join(model_dir, quantized_graph_name)
+            try:
+                self._write_quantized_graph(frozen_graph_file, quantized_graph_file)
+                quantized = True
+            except ValueError as e:
+                logger.warning("{} Keeping the float graph.".format(e))
+
+        if quantized:
+            quantized_predict_fn = FrozenGraphPredictor(
+                quantized_graph_file,
+                signature["inputs"],
+                signature["output"],
+                config=self.session_config,
+            )
+            exports["quantized_graph"] = (quantized_graph_file, quantized_predict_fn)
+            meta["frozen_graph"] = quantized_graph_name
+            meta["quantization_report"] = self._quantization_report(
+                frozen_predict_fn, quantized_predict_fn
+            )
+
+        report = compare_exports(exports, self._sample_predictor_inputs())
+        for name, stats in sorted(report.items()):
+            logger.info(
+                "Exported {}: {:.1f} MB, {:.2f} ms per request"
+                "".format(name, stats["size_mb"], stats["latency_ms"])
+            )
+        meta["export_report"] = report
+
+        if quantized:
+            # Only the quantized graph is loaded again, keeping the float
+            # copies would defeat the point of quantizing
+            tf.gfile.Remove(frozen_graph_file)
+            tf.gfile.DeleteRecursively(saved_model_dir)
+
+        return meta
+
+    @staticmethod
+    def _write_quantized_graph(
+        frozen_graph_file: Text, quantized_graph_file: Text
+    ) -> None:
+        graph_def = tf.GraphDef()
+        with tf.gfile.GFile(frozen_graph_file, "rb") as reader:
+            graph_def.ParseFromString(reader.read())
+
+        graph_def = quantize_graph_def(graph_def)
+
+        with tf.gfile.GFile(quantized_graph_file, "wb") as writer:
+            writer.write(graph_def.SerializeToString())
+
+    def _quantization_report(
+        self, float_predict_fn: "Predictor", quantized_predict_fn: "Predictor"
+    ) -> Dict[Text, Any]:
+        """Accuracy of the float and the quantized model on the held out
+        training examples."""
+
+        if not self.holdout_examples:
+            logger.warning(
+                "No held out examples, the accuracy of the quantized "
+                "model was not measured."
+            )
+            return {"holdout_examples": 0}
+
+        features = convert_examples_to_features(
+            self.holdout_examples,
+            self.label_list,
+            self.max_seq_length,
+            self.tokenizer,
+        )
+        label_ids = np.array([feature.label_id for feature in features])
+
+        accuracy = {}
+        for name, predict_fn in (
+            ("float", float_predict_fn),
+            ("quantized", quantized_predict_fn),
+        ):
+            predictions = [
+                np.argmax(
+                    predict_fn(
+                        self._predictor_inputs(
+                            features[start : start + self.predict_batch_size],
+                            self.max_seq_length,
+                        )
+                    )["probabilities"],
+                    axis=1,
+                )
+                for start in range(0, len(features), self.predict_batch_size)
+            ]
+            accuracy[name] = float(np.mean(np.concatenate(predictions) == label_ids))
+
+        report = {
+            "holdout_examples": len(features),
+            "float_accuracy": accuracy["float"],
+            "quantized_accuracy": accuracy["quantized"],
+            "accuracy_delta": accuracy["quantized"] - accuracy["float"],
+        }
+        logger.info(
+            "Accuracy on {} held out examples: {:.4f} float, {:.4f} quantized "
+            "({:+.4f})".format(
+                report["holdout_examples"],
+                report["float_accuracy"],
+                report["quantized_accuracy"],
+                report["accuracy_delta"],
+            )
+        )
+        return report
+
+    def _sample_predictor_inputs(self) -> Dict[Text, np.ndarray]:
+        """Predictor inputs of a single short request."""
+
+        example = InputExample(
+            guid="sample", text_a="hello", label=self.label_list[0]
+        )
+        features = convert_examples_to_features(
+            [example], self.label_list, self.max_seq_length, self.tokenizer
+        )
+        return self._predictor_inputs(features, self.max_seq_length)
 
     @classmethod
     def load(
@@ -277,20 +831,43 @@ class BertIntentClassifier(Component):
             model_path = os.path.join(model_dir,temp_path)
 
             graph = tf.Graph()
-            with graph.as_default():
-                sess = tf.Session()
-                predict_fn = predictor.from_saved_model(model_path)
+            session_config = cls._session_config(meta)
+            if meta.get("frozen_graph"):
+                predict_fn = FrozenGraphPredictor(
+                    os.path.join(model_dir, meta["frozen_graph"]),
+                    meta["frozen_graph_inputs"],
+                    meta["frozen_graph_output"],
+                    config=session_config,
+                    graph=graph,
+                )
+            else:
+                predict_fn = predictor.from_saved_model(
+                    model_path, graph=graph, config=session_config
+                )
 
             with io.open(
                 os.path.join(model_dir, file_name + "_label_list.pkl"), "rb"
             ) as f:
                 label_list = pickle.load(f)
 
+            if meta.get("vocab_file"):
+                tokenizer = FullTokenizer(
+                    vocab_file=None,
+                    do_lower_case=meta["do_lower_case"],
+                    compiled_vocab_file=os.path.join(model_dir, meta["vocab_file"]),
+                )
+            else:
+                # Models persisted before the vocab was stored with them
+                tokenizer = None
+
             return cls(
                 component_config=meta,
-                session=sess,
+                # Both predictors run in a session of their own on `graph`
+                session=predict_fn.session,
                 label_list=label_list,
                 predict_fn=predict_fn,
+                tokenizer=tokenizer,
+                graph=graph,
             )
 
         else:
@@ -0,0 +1,152 @@
+"""
+Coalesces concurrent single-item requests into batches.
+
+Used by `BertIntentClassifier` in serving mode, so that parse requests hitting
+one loaded model at the same time share a single predictor call.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingRequest(object):
+    """An item waiting in the queue, plus what its caller is blocked on."""
+
+    __slots__ = ("item", "done", "error")
+
+    def __init__(self, item: Any) -> None:
+        self.item = item
+        self.done = threading.Event()
+        self.error = None
+
+
+class RequestCoalescer(object):
+    """Queues items from concurrent callers and processes them in batches.
+
+    A background worker waits for the first queued item, then keeps collecting
+    items until `max_batch_size` items are queued or `max_wait_ms` has passed
+    since the first one arrived. The batch goes through one `process_batch`
+    call and every caller blocked in `submit` is released.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], None],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5,
+    ) -> None:
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        # Guards `_closed`, so that nothing is queued behind the stop marker
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._worker = threading.Thread(target=self._run, name="request-coalescer")
+        self._worker.daemon = True
+        self._worker.start()
+
+    def submit(self, item: Any) -> None:
+        """Process `item` as part of the next batch and wait until it is done.
+
+        Exceptions raised by `process_batch` are re-raised in every caller
+        whose item was part of the failed batch."""
+
+        request = _PendingRequest(item)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Cannot submit to a closed RequestCoalescer.")
+            self._queue.put(request)
+        request.done.wait()
+
+        if request.error is not None:
+            raise request.error
+
+    def close(self) -> None:
+        """Stop the worker after the already queued items are processed."""
+
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self) -> Optional[List[_PendingRequest]]:
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                # Put the stop marker back so the worker exits after this batch
+                self._queue.put(None)
+                break
+            batch.append(request)
+
+        return batch
+
+    def _run(self) -> None:
+        try:
+            while True:
+                batch = self._collect()
+                if batch is None:
+                    return
+                self._process(batch)
+        finally:
+            self._fail_pending()
+
+    def _process(self, batch: List[_PendingRequest]) -> None:
+        try:
+            self.process_batch([request.item for request in batch])
+        except BaseException as e:
+            logger.error(
+                "Failed to process a batch of {} coalesced requests: {!r}"
+                "".format(len(batch), e)
+            )
+            error = (
+                e
+                if isinstance(e, Exception)
+                else RuntimeError("RequestCoalescer worker stopped: {!r}".format(e))
+            )
+            for request in batch:
+                request.error = error
+            if not isinstance(e, Exception):
+                # Stops the worker, `_fail_pending` releases the other callers
+                raise
+        finally:
+            for request in batch:
+                request.done.set()
+
+    def _fail_pending(self) -> None:
+        """Release the callers of requests the stopped worker never got to."""
+
+        with self._lock:
+            self._closed = True
+
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if request is not None:
+                request.error = RuntimeError(
+                    "RequestCoalescer stopped before processing the request."
+                )
+                request.done.set()
@@ -15,6 +15,8 @@ import os
 import warnings
 import re
 
+from functools import lru_cache
+
 from builtins import str
 from typing import Any
 from typing import Dict
@@ -27,6 +29,7 @@ from rasa.nlu.training_data import Message, TrainingData
 from rasa.nlu.utils import write_json_to_file
 
 from innatis.extractors.composite_data_extractor import CompositeDataExtractor
+from innatis.extractors.lookup_matcher import LookupMatcher
 
 from word2number import w2n
 
@@ -39,6 +42,50 @@ except ImportError:
 
 COMPOSITE_ENTITIES_FILE_NAME = "composite_entities.json"
 
+NUMBER_EXPRESSIONS = {
+    'number': re.compile(r'\d+'),
+    'year': re.compile(r'\d{4}'),
+}
+
+NUMBER_WORDS = frozenset(w2n.american_number_system)
+
+
+def find_number_by_regex(child_name, broad_value):
+    expression = NUMBER_EXPRESSIONS.get(child_name,
+                                        NUMBER_EXPRESSIONS['number'])
+    match = expression.search(broad_value)
+    if match:
+        return match.group()
+    return False
+
+
+def find_number_in_words(word):
+    # Most values hold no number words at all, which w2n only tells by
+    # raising a ValueError. Check for them the same way it looks for them.
+    number_sentence = word.replace('-', ' ').lower()
+    if not (number_sentence.isdigit() or
+            any(each_word in NUMBER_WORDS
+                for each_word in number_sentence.split())):
+        return False
+
+    match = False
+    try:
+        match = w2n.word_to_num(builtin_str(word))
+    except ValueError:
+        pass
+    return match
+
+
+@lru_cache(maxsize=4096)
+def find_number(child_name, broad_value):
+    """The number for an `@number` or `@year` child in `broad_value`,
+    `False` if there is none"""
+    match = find_number_by_regex(child_name, broad_value)
+    if not match:
+        match = find_number_in_words(broad_value)
+    return match
+
+
 class CompositeEntityExtractor(EntityExtractor):
 
     name = "composite_entity_extractor"
@@ -55,13 +102,36 @@ class CompositeEntityExtractor(EntityExtractor):
                 'lookup_tables': [],
                 'composite_entities': []
             }
+        self._build_indexes()
+
+    def _build_indexes(self):
+        """Index the lookup tables and composite entities by name
+
+        Both map a name to a list, in the original order, as several tables
+        or composite entities may share one name. Each composite entity
+        comes with its `@` children.
+        """
+        self.lookup_matchers = {}
+        for each_lookup in self.composite_entities['lookup_tables']:
+            self.lookup_matchers.setdefault(each_lookup['name'], []).append(
+                LookupMatcher(each_lookup['elements']))
+
+        self.composites = {}
+        for each_composite in self.composite_entities['composite_entities']:
+            composite_children = [
+                child for child in each_composite['composites']
+                if child.startswith('@')
+            ]
+            self.composites.setdefault(each_composite['name'], []).append(
+                (each_composite, composite_children))
 
     def train(self, training_data, cfg, **kwargs):
         compositeDataExtractor = CompositeDataExtractor()
         lookup_tables, composite_entities = compositeDataExtractor.get_data(
             training_data,language=cfg.language)
-        self.add_lookup_tables(lookup_tables)
         self.composite_entities['composite_entities'] = composite_entities
+        # Also rebuilds the indexes, including the composite entities
+        self.add_lookup_tables(lookup_tables)
 
     def process(self, message, **kwargs):
         # type: (Message, **Any) -> None
@@ -119,150 +189,84 @@ class CompositeEntityExtractor(EntityExtractor):
             return True
         return False
 
-    def merge_two_dicts(self, x, y):
-        z = x.copy()
-        z.update(y)
-        return z
-
-    def break_on_lookup_tables(self, each_lookup,
-                               child_name,
-                               broad_value):
-        for lookup_entry in each_lookup['elements']:
-            if(self.search_string_with_boundary(broad_value, lookup_entry.lower())):
-                return {
-                    child_name: lookup_entry
-                }
-        return {}
-
-    def split_by_lookup_tables(self, composite_child, broad_value):
-        broken_entity = {}
+    def split_by_lookup_tables(self, composite_child, broad_value,
+                               broken_entity):
         child_name = composite_child[1:]
-        for each_lookup in self.composite_entities['lookup_tables']:
-            if(each_lookup['name'] == child_name):
-                broken_entity = self.merge_two_dicts(
-                    broken_entity,
-                    self.break_on_lookup_tables(each_lookup,
-                                                child_name,
-                                                broad_value))
+        for lookup_matcher in self.lookup_matchers.get(child_name, []):
+            lookup_entry = lookup_matcher.search(broad_value)
+            if lookup_entry is not None:
+                broken_entity[child_name] = lookup_entry
         return broken_entity
 
     def find_number_in_words(self, word):
-        match = False
-        try:
-            match = w2n.word_to_num(builtin_str(word))
-        except ValueError:
-            pass
-        return match
+        return find_number_in_words(word)
 
     def find_number_by_regex(self, child_name, broad_value):
-        match = False
-        expression = r'\d+'
-        if(child_name == 'year'):
-            expression = r'\d{4}'
-        match = re.findall(expression, broad_value)
-        if match:
-            match = match[0]
-        return match
-
-    def split_by_sys(self, composite_child, broad_value):
-        broken_entity = {}
+        return find_number_by_regex(child_name, broad_value)
+
+    def split_by_sys(self, composite_child, broad_value, broken_entity):
         if(composite_child in ['@number', '@year']):
             child_name = composite_child[1:]
-            match = self.find_number_by_regex(child_name, broad_value)
-            if not match:
-                match = self.find_number_in_words(broad_value)
+            match = find_number(child_name, broad_value)
             if match:
                 broken_entity[child_name] = int(match)
         return broken_entity
 
-    def split_one_level(self, composite_child, broad_value):
-        broken_entity = {}
-        broken_entity = self.merge_two_dicts(
-            broken_entity,
-            self.split_by_lookup_tables(
-                composite_child,
-                broad_value)
-        )
-        broken_entity = self.merge_two_dicts(
-            broken_entity,
-            self.split_by_sys(
-                composite_child,
-                broad_value)
-        )
+    def split_one_level(self, composite_child, broad_value, broken_entity):
+        """Adds what `composite_child` matches in `broad_value` to
+        `broken_entity`, in place"""
+        self.split_by_lookup_tables(composite_child, broad_value,
+                                    broken_entity)
+        self.split_by_sys(composite_child, broad_value, broken_entity)
         return broken_entity
 
     def get_most_relevant_composite(self,
                                     composite_composites,
                                     broad_value):
-        highest_relevance_score = 0
-        composite_examples = []
+        """Returns the relevance score and the composite examples"""
         relevance_score = self.get_relevance(
             broad_value, composite_composites)
-        if(relevance_score > highest_relevance_score):
-            highest_relevance_score = relevance_score
-            composite_examples = composite_composites
-        return {
-            "highest_relevance_score": highest_relevance_score,
-            "composite_examples": composite_examples
-        }
+        if(relevance_score > 0):
+            return relevance_score, composite_composites
+        return 0, []
 
     def add_most_relevant_composite(self,
                                     most_relevant_composite,
                                     broken_entity,
                                     child_name,
-                                    broad_value
+                                    broad_value,
+                                    composite_children
                                     ):
-        if(most_relevant_composite['highest_relevance_score'] > 0):
-            broken_entity[child_name] = {}
-            ce = most_relevant_composite['composite_examples']
-            composite_children = [child for child in ce if child[0] == '@']
+        highest_relevance_score, _ = most_relevant_composite
+        if(highest_relevance_score > 0):
+            child_entity = broken_entity[child_name] = {}
             for composite_child in composite_children:
-                broken_entity[child_name] = self.merge_two_dicts(
-                    broken_entity[child_name],
-                    self.split_one_level(
-                        composite_child,
-                        broad_value)
-                )
+                self.split_one_level(composite_child, broad_value,
+                                     child_entity)
         return broken_entity
 
-    def split_two_levels(self, composite_child, broad_value):
-        broken_entity = {}
+    def split_two_levels(self, composite_child, broad_value, broken_entity):
         child_name = composite_child[1:]
-        for each_composite in self.composite_entities['composite_entities']:
-            if(each_composite['name'] == child_name):
-                composite_composites = each_composite['composites']
-                most_relevant_composite = self.get_most_relevant_composite(
-                    composite_composites, broad_value)
-                broken_entity = self.add_most_relevant_composite(
-                    most_relevant_composite,
-                    broken_entity,
-                    child_name,
-                    broad_value
-                )
+        for each_composite, composite_children in self.composites.get(
+                child_name, []):
+            composite_composites = each_composite['composites']
+            most_relevant_composite = self.get_most_relevant_composite(
+                composite_composites, broad_value)
+            self.add_most_relevant_composite(
+                most_relevant_composite,
+                broken_entity,
+                child_name,
+                broad_value,
+                composite_children
+            )
         return broken_entity
 
-    def split_composite_entity(self, composite_entry, entity):
+    def split_composite_entity(self, composite_children, entity):
         broken_entity = {}
         broad_value = entity["value"].lower()
-        composite_children = composite_entry['composites']
         for composite_child in composite_children:
-            if(composite_child[0] == '@'):
-
-                broken_entity = self.merge_two_dicts(
-                    broken_entity,
-                    self.split_one_level(
-                        composite_child,
-                        broad_value
-                    )
-                )
-
-                broken_entity = self.merge_two_dicts(
-                    broken_entity,
-                    self.split_two_levels(
-                        composite_child,
-                        broad_value
-                    )
-                )
+            self.split_one_level(composite_child, broad_value, broken_entity)
+            self.split_two_levels(composite_child, broad_value, broken_entity)
 
         entity["value"] = broken_entity
         self.add_processor_name(entity)
@@ -270,10 +274,8 @@ class CompositeEntityExtractor(EntityExtractor):
     def split_composite_entities(self, entities):
         for each_entity in entities:
             entity = each_entity["entity"]
-            ces = self.composite_entities['composite_entities']
-            for composite_entry in ces:
-                if(composite_entry['name'] == entity):
-                    self.split_composite_entity(composite_entry, each_entity)
+            for _, composite_children in self.composites.get(entity, []):
+                self.split_composite_entity(composite_children, each_entity)
 
     def add_lookup_tables(self, lookup_tables):
         """Need to sort by length so that we get the broadest entry first"""
@@ -281,3 +283,4 @@ class CompositeEntityExtractor(EntityExtractor):
             if('elements' in lookup):
                 lookup['elements'].sort(key=len, reverse=True)
                 self.composite_entities['lookup_tables'].append(lookup)
+        self._build_indexes()
@@ -10,6 +10,8 @@ from rasa.nlu.model import Metadata
 from rasa.nlu.training_data import Message, TrainingData
 from rasa.nlu.utils import write_json_to_file
 
+from innatis.extractors.fuzzy_index import FuzzyIndex
+
 ENTITY_SYNONYMS_FILE_NAME = "entity_synonyms.json"
 
 
@@ -31,6 +33,10 @@ class EntitySynonymMapper(EntityExtractor):
 
         self.synonyms = synonyms if synonyms else {}
 
+        self._fuzzy_index = None
+        if self.component_config["fuzzy_matching"]:
+            self._build_fuzzy_index()
+
     def train(self,
               training_data: TrainingData,
               config: RasaNLUModelConfig,
@@ -45,6 +51,9 @@ class EntitySynonymMapper(EntityExtractor):
                 self.add_entities_if_synonyms(entity_val,
                                               str(entity.get("value")))
 
+        if self.component_config["fuzzy_matching"]:
+            self._build_fuzzy_index()
+
     def process(self, message: Message, **kwargs: Any) -> None:
 
         updated_entities = message.get("entities", [])[:]
@@ -115,23 +124,44 @@ class EntitySynonymMapper(EntityExtractor):
                         entity["value"] = matched
                         self.add_processor_name(entity)
 
+    def _build_fuzzy_index(self) -> None:
+        """Index the synonyms and the lowercased original values for fuzzy
+        matching"""
+
+        original_values = {}
+        for original_value in set(self.synonyms.values()):
+            original_values.setdefault(original_value.lower(), []).append(
+                original_value)
+
+        self._fuzzy_index = (FuzzyIndex(self.synonyms.keys()),
+                             FuzzyIndex(original_values.keys()),
+                             original_values)
+
     def fuzzy_match_entity(self, lookup_value):
         threshold = self.component_config["fuzzy_threshold"]
         fuzzy_match = None
 
-        # Match the synonyms
-        for synonym in self.synonyms.keys():
+        if self._fuzzy_index is None:
+            self._build_fuzzy_index()
+        synonym_index, original_value_index, original_values = \
+            self._fuzzy_index
+
+        # Match the synonyms, only comparing with those that may be
+        # similar enough
+        for synonym in synonym_index.candidates(lookup_value, threshold):
             similarity = EntitySynonymMapper.calc_similarity(synonym, lookup_value)
             if similarity >= threshold:
                 candidate = (similarity, self.synonyms[synonym])
                 fuzzy_match = max(candidate, fuzzy_match) if fuzzy_match else candidate
 
         # Match the original values
-        for original_value in set(self.synonyms.values()):
-            similarity = EntitySynonymMapper.calc_similarity(original_value.lower(), lookup_value)
+        for lowercase_value in original_value_index.candidates(lookup_value,
+                                                               threshold):
+            similarity = EntitySynonymMapper.calc_similarity(lowercase_value, lookup_value)
             if similarity >= threshold:
-                candidate = (similarity, original_value)
-                fuzzy_match = max(candidate, fuzzy_match) if fuzzy_match else candidate
+                for original_value in original_values[lowercase_value]:
+                    candidate = (similarity, original_value)
+                    fuzzy_match = max(candidate, fuzzy_match) if fuzzy_match else candidate
 
         return fuzzy_match[1] if fuzzy_match else None
 
@@ -167,3 +197,5 @@ class EntitySynonymMapper(EntityExtractor):
                                             repr(replacement)))
 
                 self.synonyms[original] = replacement
+                # Rebuilt when it is needed next
+                self._fuzzy_index = None
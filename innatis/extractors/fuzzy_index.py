@@ -0,0 +1,88 @@
+import editdistance
+from typing import Callable, Iterable, List, Text, Tuple
+
+
+class BKTree(object):
+    """Burkhard-Keller tree of strings under the edit distance.
+
+    Finds all strings within a given distance of a query without comparing
+    the query to every string, by pruning subtrees with the triangle
+    inequality.
+    """
+
+    def __init__(self,
+                 distance: Callable[[Text, Text], int] = editdistance.eval
+                 ) -> None:
+        self.distance = distance
+        self.words = []
+        # A node is a word and its children, keyed by their distance to it
+        self._root = None
+
+    def add(self, word: Text) -> None:
+        if self._root is None:
+            self._root = (word, {})
+            self.words.append(word)
+            return
+
+        node = self._root
+        while True:
+            node_word, children = node
+            distance = self.distance(word, node_word)
+            if distance == 0:
+                return
+            if distance not in children:
+                children[distance] = (word, {})
+                self.words.append(word)
+                return
+            node = children[distance]
+
+    def search(self, word: Text, radius: int) -> List[Tuple[int, Text]]:
+        """All `(distance, word)` pairs of words within `radius`"""
+
+        if self._root is None or radius < 0:
+            return []
+
+        found = []
+        nodes = [self._root]
+        while nodes:
+            node_word, children = nodes.pop()
+            distance = self.distance(word, node_word)
+            if distance <= radius:
+                found.append((distance, node_word))
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    nodes.append(child)
+        return found
+
+
+class FuzzyIndex(object):
+    """Finds the strings that may be similar enough to a query, as measured
+    by `EntitySynonymMapper.calc_similarity`.
+
+    Strings are kept in one `BKTree` per length. A similarity of at least
+    `t` between strings of lengths `a` and `b` allows an edit distance of
+    at most `max(a, b) - t * (a + b) / 2`, which is at least `|a - b|` only
+    for lengths close to each other, so most trees are skipped and the
+    others are searched with a small radius.
+    """
+
+    def __init__(self, words: Iterable[Text] = ()) -> None:
+        self._trees = {}
+        for word in words:
+            self._trees.setdefault(len(word), BKTree()).add(word)
+
+    def candidates(self, word: Text, threshold: float) -> List[Text]:
+        """A superset of the strings at least `threshold` similar to `word`"""
+
+        if threshold <= 0:
+            return [w for tree in self._trees.values() for w in tree.words]
+
+        length = len(word)
+        candidates = []
+        for other_length, tree in self._trees.items():
+            # The small epsilon keeps float rounding from losing a distance
+            radius = int(max(length, other_length) -
+                         threshold * (length + other_length) / 2 + 1e-9)
+            if radius >= abs(length - other_length):
+                candidates.extend(w for _, w in tree.search(word, radius))
+        return candidates
@@ -0,0 +1,115 @@
+"""
+Aho-Corasick matching of lookup table elements as whole words.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from collections import deque
+
+
+def _is_word_char(text, position):
+    # Same as `\w` of a unicode regex, positions outside the text are not
+    char = text[position] if 0 <= position < len(text) else ""
+    return char.isalnum() or char == "_"
+
+
+def _is_boundary(text, position):
+    # Same as `\b`
+    return _is_word_char(text, position - 1) != _is_word_char(text, position)
+
+
+class LookupMatcher(object):
+    """Finds the first element of a lookup table that occurs in a text.
+
+    Gives the same element as trying
+    `re.search(r"\\b" + re.escape(element.lower()) + r"\\b", text)` for each
+    element in table order, but in a single pass over the text, however
+    many elements the table has.
+    """
+
+    def __init__(self, elements):
+        self.elements = elements
+
+        # The trie of the lowercased elements, `_match` holds the
+        # `(index, length)` of the first element ending in each state
+        self._goto = [{}]
+        self._match = [None]
+        self._empty_index = None
+
+        for index, element in enumerate(elements):
+            pattern = element.lower()
+            if not pattern:
+                if self._empty_index is None:
+                    self._empty_index = index
+                continue
+
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._match.append(None)
+                    self._goto[state][char] = next_state
+                state = next_state
+            if self._match[state] is None:
+                self._match[state] = (index, len(pattern))
+
+        self._build_links()
+
+    def _build_links(self):
+        # `_fail` leads to the state of the longest proper suffix in the trie,
+        # `_output` to the next state along the fail links that ends an
+        # element
+        self._fail = [0] * len(self._goto)
+        self._output = [0] * len(self._goto)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+
+                self._fail[next_state] = fail
+                self._output[next_state] = (
+                    fail if self._match[fail] is not None else self._output[fail]
+                )
+
+    def search(self, text):
+        """Returns the first element in table order that occurs in `text`
+        as a whole word, `None` if none does."""
+
+        goto, fail, match, output = self._goto, self._fail, self._match, self._output
+
+        best = None
+        if self._empty_index is not None and any(
+            _is_boundary(text, position) for position in range(len(text) + 1)
+        ):
+            best = self._empty_index
+
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            candidate = state if match[state] is not None else output[state]
+            while candidate:
+                index, length = match[candidate]
+                if (
+                    (best is None or index < best)
+                    and _is_boundary(text, end - length)
+                    and _is_boundary(text, end)
+                ):
+                    best = index
+                candidate = output[candidate]
+
+        return None if best is None else self.elements[best]
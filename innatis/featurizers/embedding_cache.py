@@ -0,0 +1,132 @@
+"""Cache of sentence embeddings keyed on the normalized message text."""
+
+import collections
+import io
+import sqlite3
+import threading
+import unicodedata
+
+import numpy as np
+
+
+class EmbeddingCache(object):
+    """LRU cache of embeddings with an optional persistent tier on disk.
+
+    Texts are normalized before lookup (Unicode NFC, whitespace collapsed),
+    so the embedding should be computed for `normalize(text)` as well.
+    Embeddings evicted from memory stay in the SQLite database at
+    `cache_file`, and survive restarts. Several processes can share the
+    same file. Cached embeddings are read-only.
+    """
+
+    def __init__(self, max_size=10000, cache_file=None):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = self._open_disk(cache_file) if cache_file else None
+
+    @staticmethod
+    def _open_disk(cache_file):
+        # Autocommit, so that `put_many` controls its transactions, and wait
+        # for the lock when another process is writing
+        disk = sqlite3.connect(
+            cache_file, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        disk.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(text TEXT PRIMARY KEY, embedding BLOB NOT NULL)"
+        )
+        return disk
+
+    @staticmethod
+    def _to_bytes(embedding):
+        buffer = io.BytesIO()
+        np.save(buffer, embedding, allow_pickle=False)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _from_bytes(data):
+        return np.load(io.BytesIO(data), allow_pickle=False)
+
+    def _load(self, key):
+        row = self._disk.execute(
+            "SELECT embedding FROM embeddings WHERE text = ?", (key,)
+        ).fetchone()
+        return None if row is None else self._from_bytes(row[0])
+
+    @staticmethod
+    def normalize(text):
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def get(self, text):
+        """Returns the cached embedding of `text`, `None` on a miss."""
+        key = self.normalize(text)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+            elif self._disk is not None:
+                embedding = self._load(key)
+                if embedding is not None:
+                    embedding.flags.writeable = False
+                    self._remember(key, embedding)
+
+            if embedding is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return embedding
+
+    def put(self, text, embedding):
+        self.put_many([text], [embedding])
+
+    def put_many(self, texts, embeddings):
+        """Caches several embeddings, written to disk in one transaction."""
+        entries = []
+        for text, embedding in zip(texts, embeddings):
+            # A copy, so that a row of a batch does not keep the whole batch
+            # alive
+            embedding = np.array(embedding)
+            embedding.flags.writeable = False
+            entries.append((self.normalize(text), embedding))
+
+        with self._lock:
+            for key, embedding in entries:
+                self._remember(key, embedding)
+            if self._disk is not None and entries:
+                self._disk.execute("BEGIN")
+                try:
+                    self._disk.executemany(
+                        "INSERT OR REPLACE INTO embeddings VALUES (?, ?)",
+                        [(key, self._to_bytes(e)) for key, e in entries],
+                    )
+                except Exception:
+                    self._disk.execute("ROLLBACK")
+                    raise
+                self._disk.execute("COMMIT")
+
+    def _remember(self, key, embedding):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / float(lookups) if lookups else 0.0,
+                "size": len(self._entries),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
@@ -9,11 +9,19 @@ Thanks Scalable Minds - we should probably tell them about this
 https://scalableminds.com/#contact-us
 """
 
+import hashlib
+import logging
+import os
+
 from rasa.nlu.featurizers import Featurizer
 
 import tensorflow_hub as hub
 import tensorflow as tf
 
+from innatis.featurizers.embedding_cache import EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
 
 class UniversalSentenceEncoderFeaturizer(Featurizer):
     """Appends a universal sentence encoding to the message's text_features."""
@@ -27,50 +35,146 @@ class UniversalSentenceEncoderFeaturizer(Featurizer):
     requires = []
     provides = ["text_features"]
 
+    defaults = {
+        # Number of sentence embeddings kept in memory, 0 to disable
+        "embedding_cache_size": 10000,
+        # Directory of an on-disk embedding cache shared between runs
+        "embedding_cache_dir": None,
+        # Number of sentences encoded in one session run
+        "batch_size": 256,
+        # Local directory or URL of the hub module, `TFHUB_URL` if not set
+        "module_path": None,
+        # Thread pool sizes of the encoder session, 0 lets TensorFlow pick
+        "intra_op_parallelism_threads": 0,
+        "inter_op_parallelism_threads": 0,
+    }
+
     def __init__(self, component_config):
 
         super(UniversalSentenceEncoderFeaturizer,
               self).__init__(component_config)
 
         # Load the TensorFlow Hub Module with pre-trained weights
-        sentence_encoder = hub.Module(self.TFHUB_URL)
-        # Create a TensorFlow placeholder for the input string
-        self.input_string = tf.placeholder(tf.string, shape=[None])
-        # Invoke `sentence_encoder` in order to create the encoding tensor
-        self.encoding = sentence_encoder(self.input_string)
+        self.module_path = (self.component_config["module_path"] or
+                            self.TFHUB_URL)
+        # Where the module originally came from, also after it was loaded
+        # from a persisted copy
+        self.module_handle = (self.component_config.get("module_handle") or
+                              self.module_path)
+        # Build into a graph of our own instead of the default graph, which
+        # other TensorFlow components in the pipeline share
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            self.sentence_encoder = hub.Module(self.module_path)
+            # Create a TensorFlow placeholder for the input string
+            self.input_string = tf.placeholder(tf.string, shape=[None])
+            # Invoke `sentence_encoder` in order to create the encoding tensor
+            self.encoding = self.sentence_encoder(self.input_string)
+            initializers = [tf.global_variables_initializer(),
+                            tf.tables_initializer()]
+
+        # Create a TensorFlow Session with its own thread pools, and run
+        # initializers
+        session_config = tf.ConfigProto(
+            intra_op_parallelism_threads=self.component_config[
+                "intra_op_parallelism_threads"],
+            inter_op_parallelism_threads=self.component_config[
+                "inter_op_parallelism_threads"],
+            use_per_session_threads=True)
+        self.session = tf.Session(graph=self.graph, config=session_config)
+        self.session.run(initializers)
+
+        self.embedding_cache = self._create_embedding_cache()
+
+    def _create_embedding_cache(self):
+        cache_dir = self.component_config["embedding_cache_dir"]
+        if cache_dir:
+            # Several worker processes may start at the same time
+            os.makedirs(cache_dir, exist_ok=True)
+            # Embeddings of different modules must not be mixed up
+            module_hash = hashlib.sha1(self.module_handle.encode("utf-8"))
+            cache_file = os.path.join(cache_dir,
+                                      module_hash.hexdigest()[:16] + ".sqlite")
+        else:
+            cache_file = None
 
-        # Create a TensorFlow Session and run initializers
-        self.session = tf.Session()
-        self.session.run([tf.global_variables_initializer(),
-                          tf.tables_initializer()])
+        return EmbeddingCache(self.component_config["embedding_cache_size"],
+                              cache_file)
 
     def train(self, training_data, config, **kwargs):
 
         # Nothing to train, just process all training examples so that the
         # feature is set for future pipeline steps
-        for example in training_data.training_examples:
-            self.process(example)
+        self.process_batch(training_data.training_examples)
 
     def process(self, message, **kwargs):
 
-        # Get the sentence encoding by feeding the message text and computing
-        # the encoding tensor.
-        feature_vector = self.session.run(self.encoding,
-                                          {self.input_string:
-                                           [message.text]})[0]
-        # Concatenate the feature vector with any existing text features
-        features = self._combine_with_existing_text_features(
-            message, feature_vector)
-        # Set the feature, overwriting any existing `text_features`
-        message.set("text_features", features)
+        self.process_batch([message])
+
+    def process_batch(self, messages):
+        """Set the `text_features` of several messages, encoding up to
+        `batch_size` sentences per session run."""
+
+        batch_size = self.component_config["batch_size"]
+        for start in range(0, len(messages), batch_size):
+            batch = messages[start:start + batch_size]
+            feature_vectors = self._encode([m.text for m in batch])
+
+            for message, feature_vector in zip(batch, feature_vectors):
+                # Concatenate the feature vector with any existing text
+                # features
+                features = self._combine_with_existing_text_features(
+                    message, feature_vector)
+                # Set the feature, overwriting any existing `text_features`
+                message.set("text_features", features)
+
+    def _encode(self, texts):
+        """Sentence encodings of `texts`, from the cache where possible."""
+
+        feature_vectors = [self.embedding_cache.get(text) for text in texts]
+
+        # Get the missing sentence encodings by feeding all their texts at
+        # once and computing the encoding tensor.
+        missing = sorted(set(self.embedding_cache.normalize(text)
+                             for text, vector in zip(texts, feature_vectors)
+                             if vector is None))
+        if missing:
+            encodings = self.session.run(self.encoding,
+                                         {self.input_string: missing})
+            self.embedding_cache.put_many(missing, encodings)
+            encoded = dict(zip(missing, encodings))
+
+            feature_vectors = [
+                encoded[self.embedding_cache.normalize(text)]
+                if vector is None else vector
+                for text, vector in zip(texts, feature_vectors)
+            ]
+
+        return feature_vectors
+
+    def persist(self, file_name, model_dir):
+        """Export the hub module into the model directory, so that loading
+        the model needs neither the network nor the hub cache."""
+
+        module_file = file_name + "_module"
+        # The module can only be exported from the graph it was created in
+        with self.graph.as_default():
+            self.sentence_encoder.export(os.path.join(model_dir, module_file),
+                                         self.session)
+
+        return {"module_file": module_file,
+                "module_handle": self.module_handle}
 
     @classmethod
-    def load(cls, model_dir=None, model_metadata=None, cached_component=None,
-             **kwargs):
+    def load(cls, meta, model_dir=None, model_metadata=None,
+             cached_component=None, **kwargs):
         """Load this component from file."""
 
         if cached_component:
             return cached_component
-        else:
-            component_config = model_metadata.for_component(cls.name)
-            return cls(component_config)
+
+        component_config = dict(meta)
+        if model_dir and meta.get("module_file"):
+            component_config["module_path"] = os.path.join(
+                model_dir, meta["module_file"])
+        return cls(component_config)
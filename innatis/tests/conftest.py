@@ -0,0 +1,32 @@
+import pytest
+
+from innatis.classifiers.bert.tokenization import FullTokenizer
+
+# Wordpiece vocab of the BERT tests, "hello world menus" has the ids 4, 5, 6, 7
+BERT_VOCAB = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "hello", "world", "menu", "##s"]
+
+
+@pytest.fixture
+def make_bert_tokenizer(tmpdir):
+    """Builds a `FullTokenizer` over a list of wordpieces, `BERT_VOCAB` by
+    default."""
+
+    def make_bert_tokenizer(vocab=BERT_VOCAB):
+        vocab_file = tmpdir.join("vocab.txt")
+        vocab_file.write("\n".join(vocab))
+        return FullTokenizer(vocab_file=str(vocab_file))
+
+    return make_bert_tokenizer
+
+
+@pytest.fixture
+def bert_tokenizer(make_bert_tokenizer):
+    return make_bert_tokenizer()
+
+
+@pytest.fixture
+def bert_model_dir(tmpdir):
+    """A `pretrained_model_dir` holding only `BERT_VOCAB`, read as uncased."""
+    model_dir = tmpdir.mkdir("uncased_test_model")
+    model_dir.join("vocab.txt").write("\n".join(BERT_VOCAB))
+    return str(model_dir)
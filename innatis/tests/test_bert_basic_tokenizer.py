@@ -0,0 +1,28 @@
+from hypothesis import given, strategies as st
+
+from innatis.classifiers.bert.tokenization import BasicTokenizer
+
+
+ascii_text = st.text(alphabet=st.characters(max_codepoint=0x7F))
+
+
+@given(text=ascii_text, do_lower_case=st.booleans())
+def test_basic_ascii_fast_path_matches_unicode_path(text, do_lower_case):
+    tokenizer = BasicTokenizer(do_lower_case=do_lower_case)
+
+    assert tokenizer._tokenize_ascii(text) == tokenizer._tokenize_unicode(text)
+
+
+@given(text=st.text(), do_lower_case=st.booleans())
+def test_basic_tokenize_matches_unicode_path(text, do_lower_case):
+    tokenizer = BasicTokenizer(do_lower_case=do_lower_case)
+
+    assert tokenizer.tokenize(text) == tokenizer._tokenize_unicode(text)
+
+
+def test_basic_ascii_fast_path():
+    tokenizer = BasicTokenizer()
+
+    assert tokenizer.tokenize("Hello,\tWORLD!\x00 It's  me\r\n") == [
+        "hello", ",", "world", "!", "it", "'", "s", "me",
+    ]
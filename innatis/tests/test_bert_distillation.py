@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+from tensorflow.contrib import predictor
+
+from innatis.classifiers.bert.distillation import (
+    distillation_input_fn_builder,
+    distillation_model_fn_builder,
+    student_bert_config,
+)
+from innatis.classifiers.bert.modeling import BertConfig
+from innatis.classifiers.bert.run_classifier import serving_input_fn_builder
+
+
+def test_student_config_overrides_teacher_config():
+    teacher_config = BertConfig(
+        vocab_size=30522,
+        hidden_size=1024,
+        num_hidden_layers=24,
+        num_attention_heads=16,
+        intermediate_size=4096,
+    )
+
+    config = student_bert_config(
+        100, {"num_hidden_layers": 4, "hidden_size": 256}, teacher_config
+    )
+
+    assert config.vocab_size == 100
+    assert config.num_hidden_layers == 4
+    assert config.hidden_size == 256
+    assert config.num_attention_heads == 16
+    assert config.intermediate_size == 4096
+    assert teacher_config.num_hidden_layers == 24
+
+
+def test_student_config_defaults_to_bert_base():
+    config = student_bert_config(100, {"num_hidden_layers": 2})
+
+    assert config.num_hidden_layers == 2
+    assert config.hidden_size == 768
+
+
+def test_student_config_is_validated():
+    with pytest.raises(ValueError):
+        student_bert_config(100, {"num_layers": 2})
+    with pytest.raises(ValueError):
+        student_bert_config(100, {"hidden_size": 100})
+
+
+def test_student_trains_on_teacher_log_probs_and_exports(tmpdir):
+    seq_length = 8
+    num_labels = 3
+    num_examples = 6
+    bert_config = BertConfig(
+        vocab_size=20,
+        hidden_size=8,
+        num_hidden_layers=1,
+        num_attention_heads=2,
+        intermediate_size=16,
+        max_position_embeddings=seq_length,
+    )
+
+    rng = np.random.RandomState(0)
+    arrays = {
+        "input_ids": rng.randint(1, 20, size=(num_examples, seq_length)),
+        "input_mask": np.ones((num_examples, seq_length), dtype=np.int8),
+        "segment_ids": np.zeros((num_examples, seq_length), dtype=np.int8),
+        "label_ids": rng.randint(0, num_labels, size=num_examples),
+    }
+    teacher_log_probs = np.log(rng.dirichlet(np.ones(num_labels), num_examples))
+
+    estimator = tf.estimator.Estimator(
+        model_fn=distillation_model_fn_builder(
+            bert_config,
+            num_labels,
+            learning_rate=1e-3,
+            num_train_steps=3,
+            num_warmup_steps=1,
+        ),
+        model_dir=str(tmpdir.join("checkpoints")),
+        params={"batch_size": 2},
+    )
+    estimator.train(
+        input_fn=distillation_input_fn_builder(
+            arrays,
+            teacher_log_probs,
+            seq_length,
+            is_training=True,
+            drop_remainder=True,
+        ),
+        max_steps=3,
+    )
+    export_dir = estimator.export_savedmodel(
+        str(tmpdir.join("export")), serving_input_fn_builder(seq_length)
+    )
+
+    predict_fn = predictor.from_saved_model(export_dir)
+    log_probs = predict_fn(
+        {name: values[:4].astype(np.int32) for name, values in arrays.items()}
+    )["probabilities"]
+
+    assert log_probs.shape == (4, num_labels)
+    np.testing.assert_allclose(np.exp(log_probs).sum(axis=1), 1.0, rtol=1e-5)
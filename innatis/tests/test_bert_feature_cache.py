@@ -0,0 +1,54 @@
+import numpy as np
+
+from innatis.classifiers.bert.feature_cache import (
+    FEATURE_ARRAYS,
+    features_cache_key,
+    load_or_convert_features,
+)
+from innatis.classifiers.bert.run_classifier import InputExample
+from innatis.classifiers.bert.tokenization import FullTokenizer, compile_vocab
+
+LABELS = ["greet", "menu"]
+
+
+def _examples(*texts):
+    return [
+        InputExample(guid=i, text_a=text, label=LABELS[i % 2])
+        for i, text in enumerate(texts)
+    ]
+
+
+def test_features_are_cached(tmpdir, bert_tokenizer):
+    cache_dir = str(tmpdir.join("cache"))
+    examples = _examples("hello world", "menus")
+
+    converted = load_or_convert_features(examples, LABELS, 8, bert_tokenizer, cache_dir)
+    cached = load_or_convert_features(examples, LABELS, 8, bert_tokenizer, cache_dir)
+
+    assert len(tmpdir.join("cache").listdir()) == 1
+    for name in FEATURE_ARRAYS:
+        assert isinstance(cached[name], np.memmap)
+        assert np.array_equal(converted[name], cached[name])
+    assert list(cached["input_ids"][0][:4]) == [2, 4, 5, 3]
+
+
+def test_cache_key_changes_with_inputs(tmpdir, bert_tokenizer):
+    cache_dir = str(tmpdir.join("cache"))
+
+    load_or_convert_features(_examples("hello"), LABELS, 8, bert_tokenizer, cache_dir)
+    load_or_convert_features(_examples("menus"), LABELS, 8, bert_tokenizer, cache_dir)
+    load_or_convert_features(_examples("hello"), LABELS, 16, bert_tokenizer, cache_dir)
+
+    assert len(tmpdir.join("cache").listdir()) == 3
+
+
+def test_cache_key_of_tokenizer_loaded_from_compiled_vocab(tmpdir, bert_tokenizer):
+    # Tokenizers loaded with a persisted model have no vocab.txt
+    compiled_vocab_file = str(tmpdir.join("vocab.compiled"))
+    compile_vocab(bert_tokenizer.vocab_file, compiled_vocab_file)
+    loaded = FullTokenizer(vocab_file=None, compiled_vocab_file=compiled_vocab_file)
+    examples = _examples("hello world")
+
+    assert features_cache_key(examples, LABELS, 8, loaded) == features_cache_key(
+        examples, LABELS, 8, bert_tokenizer
+    )
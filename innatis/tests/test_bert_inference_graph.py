@@ -0,0 +1,86 @@
+import numpy as np
+import tensorflow as tf
+from tensorflow.contrib import predictor
+
+from innatis.classifiers.bert.inference_graph import (
+    INFERENCE_INPUTS,
+    INFERENCE_OUTPUT,
+    FrozenGraphPredictor,
+    freeze_saved_model,
+)
+
+SEQ_LENGTH = 4
+
+NUM_LABELS = 3
+
+
+def _export_saved_model(export_dir):
+    # A stand-in for the exported classifier: the same signature, with a
+    # `label_ids` input only the training loss depends on
+    graph = tf.Graph()
+    with graph.as_default(), tf.Session(graph=graph) as sess:
+        inputs = {
+            name: tf.placeholder(tf.int32, [None, SEQ_LENGTH], name=name)
+            for name in INFERENCE_INPUTS
+        }
+        inputs["label_ids"] = tf.placeholder(tf.int32, [None], name="label_ids")
+        tokens = tf.cast(
+            inputs["input_ids"] * inputs["input_mask"] + inputs["segment_ids"],
+            tf.float32,
+        )
+        weights = tf.get_variable(
+            "output_weights",
+            [SEQ_LENGTH, NUM_LABELS],
+            initializer=tf.random_normal_initializer(seed=0),
+        )
+        log_probs = tf.nn.log_softmax(tf.matmul(tokens, weights))
+        tf.losses.sparse_softmax_cross_entropy(inputs["label_ids"], log_probs)
+
+        sess.run(tf.global_variables_initializer())
+
+        signature = tf.saved_model.signature_def_utils.predict_signature_def(
+            inputs=inputs, outputs={INFERENCE_OUTPUT: log_probs}
+        )
+        builder = tf.saved_model.builder.SavedModelBuilder(export_dir)
+        builder.add_meta_graph_and_variables(
+            sess,
+            [tf.saved_model.tag_constants.SERVING],
+            signature_def_map={
+                tf.saved_model.signature_constants.DEFAULT_SERVING_SIGNATURE_DEF_KEY: signature
+            },
+        )
+        builder.save()
+
+
+def test_frozen_graph_predicts_like_saved_model(tmpdir):
+    export_dir = str(tmpdir.join("saved_model"))
+    frozen_graph_file = str(tmpdir.join("frozen_graph.pb"))
+    _export_saved_model(export_dir)
+
+    signature = freeze_saved_model(export_dir, frozen_graph_file)
+
+    graph_def = tf.GraphDef()
+    with tf.gfile.GFile(frozen_graph_file, "rb") as reader:
+        graph_def.ParseFromString(reader.read())
+    node_names = set(node.name for node in graph_def.node)
+    assert "label_ids" not in node_names
+    assert not any(node.op.startswith("Variable") for node in graph_def.node)
+    assert sorted(signature["inputs"]) == sorted(INFERENCE_INPUTS)
+
+    rng = np.random.RandomState(0)
+    features = {
+        name: rng.randint(0, 5, size=(2, SEQ_LENGTH)).astype(np.int32)
+        for name in INFERENCE_INPUTS
+    }
+    saved_model_fn = predictor.from_saved_model(export_dir)
+    frozen_graph_fn = FrozenGraphPredictor(
+        frozen_graph_file, signature["inputs"], signature["output"]
+    )
+
+    expected = saved_model_fn(
+        dict(features, label_ids=np.zeros(2, dtype=np.int32))
+    )[INFERENCE_OUTPUT]
+    probabilities = frozen_graph_fn(features)[INFERENCE_OUTPUT]
+
+    assert probabilities.shape == (2, NUM_LABELS)
+    np.testing.assert_allclose(probabilities, expected, rtol=1e-6)
@@ -0,0 +1,177 @@
+import threading
+
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from innatis.classifiers import BertIntentClassifier
+from rasa.nlu.training_data import Message
+
+LABELS = ["affirm", "greet", "menu"]
+
+PROBABILITIES = [0.2, 0.7, 0.1]
+
+
+def fake_predict_fn(features):
+    batch_size = features["input_ids"].shape[0]
+    return {"probabilities": np.log(np.tile(PROBABILITIES, (batch_size, 1)))}
+
+
+def token_count_predict_fn(features):
+    # The most likely intent follows from the number of tokens, so that
+    # predictions handed to the wrong message show up
+    num_tokens = features["input_mask"].sum(axis=1)
+    probabilities = np.full((len(num_tokens), len(LABELS)), 0.1)
+    probabilities[np.arange(len(num_tokens)), num_tokens % len(LABELS)] = 0.8
+    return {"probabilities": np.log(probabilities)}
+
+
+@pytest.fixture
+def classifier(bert_model_dir):
+    return BertIntentClassifier(
+        component_config={"pretrained_model_dir": bert_model_dir},
+        label_list=LABELS,
+        predict_fn=fake_predict_fn,
+    )
+
+
+def test_process_sets_intent_and_ranking(classifier):
+    message = Message("hello world")
+    classifier.process(message)
+
+    assert message.get("intent")["name"] == "greet"
+    assert message.get("intent")["confidence"] == pytest.approx(0.7)
+    assert [i["name"] for i in message.get("intent_ranking")] == [
+        "greet",
+        "affirm",
+        "menu",
+    ]
+
+
+def test_given_tokenizer_is_used(bert_tokenizer):
+    classifier = BertIntentClassifier(
+        label_list=LABELS, predict_fn=fake_predict_fn, tokenizer=bert_tokenizer
+    )
+    message = Message("hello world")
+    classifier.process(message)
+
+    assert classifier.tokenizer is bert_tokenizer
+    assert message.get("intent")["name"] == "greet"
+
+
+def test_all_intents_are_ranked_by_default(classifier):
+    labels = ["intent_{}".format(i) for i in range(12)]
+    classifier.label_list = labels
+    classifier.predict_fn = lambda features: {
+        "probabilities": np.log(np.full((len(features["input_ids"]), 12), 1 / 12.0))
+    }
+    message = Message("hello world")
+    classifier.process(message)
+
+    assert sorted(i["name"] for i in message.get("intent_ranking")) == sorted(labels)
+
+
+def test_intent_ranking_is_cut_off(classifier):
+    classifier.intent_ranking_length = 2
+    message = Message("hello world")
+    classifier.process(message)
+
+    assert [i["name"] for i in message.get("intent_ranking")] == ["greet", "affirm"]
+
+    classifier.intent_ranking_min_confidence = 0.5
+    classifier.process(message)
+
+    assert [i["name"] for i in message.get("intent_ranking")] == ["greet"]
+
+
+def test_process_batch_classifies_all_messages(classifier):
+    classifier.predict_batch_size = 2
+    messages = [Message(text) for text in ("hello", "menus", "hello world")]
+    batch_sizes = []
+
+    def predict_fn(features):
+        batch_sizes.append(features["input_ids"].shape[0])
+        return fake_predict_fn(features)
+
+    classifier.predict_fn = predict_fn
+    classifier.process_batch(messages)
+
+    assert batch_sizes == [2, 1]
+    assert all(m.get("intent")["name"] == "greet" for m in messages)
+
+
+def test_process_pads_to_length_bucket(bert_model_dir):
+    widths = []
+
+    def predict_fn(features):
+        widths.append(features["input_ids"].shape[1])
+        return token_count_predict_fn(features)
+
+    classifier = BertIntentClassifier(
+        component_config={
+            "pretrained_model_dir": bert_model_dir,
+            "max_seq_length": 16,
+            "sequence_length_buckets": [4, 8],
+        },
+        label_list=LABELS,
+        predict_fn=predict_fn,
+    )
+    # The buckets interleave: 5, 3, 6 and 4 tokens, [CLS] and [SEP] included
+    texts = ["hello world menu", "hello", "hello world menus", "hello world"]
+    messages = [Message(text) for text in texts]
+    classifier.process_batch(messages)
+
+    assert sorted(widths) == [4, 8]
+    assert [m.get("intent")["name"] for m in messages] == [
+        "menu",
+        "affirm",
+        "affirm",
+        "greet",
+    ]
+    assert sorted(classifier.bucket_latency_report()) == [4, 8]
+
+
+def test_concurrent_process_calls_are_coalesced(bert_model_dir):
+    batch_sizes = []
+
+    def predict_fn(features):
+        batch_sizes.append(features["input_ids"].shape[0])
+        return token_count_predict_fn(features)
+
+    classifier = BertIntentClassifier(
+        component_config={
+            "pretrained_model_dir": bert_model_dir,
+            "coalesce_requests": True,
+            "coalesce_max_wait_ms": 200,
+        },
+        label_list=LABELS,
+        predict_fn=predict_fn,
+    )
+    # [CLS] and [SEP] included, 3, 4 and 5 tokens
+    messages = [
+        Message(text) for text in ["hello", "hello world", "hello world menu"] * 4
+    ]
+    threads = [
+        threading.Thread(target=classifier.process, args=(message,))
+        for message in messages
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    classifier.coalescer.close()
+
+    assert [m.get("intent")["name"] for m in messages] == LABELS * 4
+    assert sum(batch_sizes) == len(messages)
+    assert len(batch_sizes) < len(messages)
+
+
+def test_process_does_not_grow_the_graph(classifier):
+    graph = tf.get_default_graph()
+    classifier.process(Message("hello world"))
+    num_nodes = len(graph.get_operations())
+
+    for _ in range(10000):
+        classifier.process(Message("hello world"))
+
+    assert len(graph.get_operations()) == num_nodes
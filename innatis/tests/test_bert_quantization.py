@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+from tensorflow.python.framework import tensor_util
+
+from innatis.classifiers.bert.quantization import (
+    VALUES_SUFFIX,
+    dequantize_graph_def,
+    quantize_graph_def,
+    quantize_weights,
+)
+
+
+def test_quantize_weights_per_output_unit():
+    rng = np.random.RandomState(0)
+    weights = rng.normal(size=(64, 16)).astype(np.float32)
+    weights[:, 3] *= 100
+    weights[:, 5] = 0
+
+    values, scales = quantize_weights(weights, axis=1)
+
+    assert values.dtype == np.int8
+    assert scales.shape == (1, 16)
+    assert np.abs(values).max() == 127
+    assert not values[:, 5].any()
+    # Rounding is off by at most half a step of each column's own scale
+    assert np.all(np.abs(values * scales - weights) <= scales / 2 + 1e-6)
+
+
+def test_quantize_weights_per_token():
+    rng = np.random.RandomState(1)
+    embeddings = rng.uniform(-1, 1, size=(100, 8)).astype(np.float32)
+
+    values, scales = quantize_weights(embeddings, axis=0)
+
+    assert scales.shape == (100, 1)
+    assert np.all(np.abs(values * scales - embeddings) <= scales / 2 + 1e-6)
+
+
+def _graph_def(weights):
+    graph_def = tf.GraphDef()
+    for name, array in sorted(weights.items()):
+        node = graph_def.node.add(name=name, op="Const")
+        node.attr["dtype"].type = tf.float32.as_datatype_enum
+        node.attr["value"].tensor.CopyFrom(tf.make_tensor_proto(array))
+    return graph_def
+
+
+def test_quantize_graph_def_round_trip():
+    rng = np.random.RandomState(2)
+    weights = {
+        "bert/encoder/layer_0/output/dense/kernel": rng.normal(size=(8, 4)),
+        # TF Hub modules nest the BERT weights in their own scope
+        "module/bert/embeddings/word_embeddings": rng.normal(size=(16, 4)),
+        "output_weights": rng.normal(size=(3, 4)),
+    }
+    weights = {name: w.astype(np.float32) for name, w in weights.items()}
+
+    quantized = quantize_graph_def(_graph_def(weights))
+    nodes = {node.name: node for node in quantized.node}
+
+    for name in (
+        "bert/encoder/layer_0/output/dense/kernel",
+        "module/bert/embeddings/word_embeddings",
+    ):
+        assert nodes[name].op == "Mul"
+        values = nodes[name + VALUES_SUFFIX].attr["value"].tensor
+        assert values.dtype == tf.int8.as_datatype_enum
+    assert nodes["output_weights"].op == "Const"
+
+    dequantized = dequantize_graph_def(quantized)
+
+    assert sorted(node.name for node in dequantized.node) == sorted(weights)
+    for node in dequantized.node:
+        array = tensor_util.MakeNdarray(node.attr["value"].tensor)
+        assert array.dtype == np.float32
+        np.testing.assert_allclose(array, weights[node.name], atol=0.05)
+
+
+def test_quantize_graph_def_without_matching_weights():
+    graph_def = _graph_def({"output_weights": np.ones((3, 4), dtype=np.float32)})
+
+    with pytest.raises(ValueError):
+        quantize_graph_def(graph_def)
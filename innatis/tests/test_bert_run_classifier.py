@@ -0,0 +1,122 @@
+import multiprocessing
+import random
+import time
+
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from innatis.classifiers.bert.run_classifier import (
+    InputExample,
+    convert_examples_to_features,
+    features_to_arrays,
+    file_based_input_fn_builder,
+    write_arrays_to_tfrecords,
+)
+
+WORDS = [
+    "show", "me", "the", "menu", "i", "want", "a", "pizza", "with", "extra",
+    "cheese", "and", "two", "cokes", "please", "what", "time", "do", "you",
+    "open", "tomorrow", "book", "table", "for", "four", "people", "tonight",
+]
+
+LABELS = ["book", "menu", "order", "hours"]
+
+
+# Leave some words out so that they get split into wordpieces or [UNK]
+VOCAB = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "##s", "##e", "##a"] + [
+    w for w in WORDS if len(w) % 3
+]
+
+
+def _corpus(num_examples, seed=42):
+    rng = random.Random(seed)
+    return [
+        InputExample(
+            guid="train-%d" % i,
+            text_a=" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 20))),
+            label=rng.choice(LABELS),
+        )
+        for i in range(num_examples)
+    ]
+
+
+def _as_tuples(features):
+    return [
+        (f.input_ids, f.input_mask, f.segment_ids, f.label_id) for f in features
+    ]
+
+
+def test_parallel_conversion_matches_serial(make_bert_tokenizer):
+    tokenizer = make_bert_tokenizer(VOCAB)
+    examples = _corpus(1000)
+
+    serial = convert_examples_to_features(examples, LABELS, 16, tokenizer)
+    parallel = convert_examples_to_features(
+        examples, LABELS, 16, tokenizer, num_workers=3
+    )
+
+    assert _as_tuples(parallel) == _as_tuples(serial)
+
+
+def _rows(arrays):
+    # Shards are read interleaved, so rows are compared regardless of order
+    return sorted(
+        zip(
+            map(tuple, arrays["input_ids"].tolist()),
+            map(tuple, arrays["input_mask"].tolist()),
+            map(tuple, arrays["segment_ids"].tolist()),
+            arrays["label_ids"].tolist(),
+        )
+    )
+
+
+def test_tfrecords_round_trip(tmpdir, make_bert_tokenizer):
+    tokenizer = make_bert_tokenizer(VOCAB)
+    features = convert_examples_to_features(_corpus(7), LABELS, 16, tokenizer)
+    arrays = features_to_arrays(features, 16)
+    input_files = [str(tmpdir.join("train-%d.tf_record" % i)) for i in range(2)]
+
+    write_arrays_to_tfrecords(arrays, input_files)
+    input_fn = file_based_input_fn_builder(
+        input_files, 16, is_training=False, drop_remainder=False
+    )
+
+    graph = tf.Graph()
+    with graph.as_default(), tf.Session(graph=graph) as sess:
+        next_batch = input_fn({"batch_size": 3}).make_one_shot_iterator().get_next()
+        batches = []
+        while True:
+            try:
+                batches.append(sess.run(next_batch))
+            except tf.errors.OutOfRangeError:
+                break
+
+    assert [len(batch["label_ids"]) for batch in batches] == [3, 3, 1]
+    read = {
+        name: np.concatenate([batch[name] for batch in batches]) for name in arrays
+    }
+    assert all(values.dtype == np.int32 for values in read.values())
+    assert _rows(read) == _rows(arrays)
+
+
+@pytest.mark.slow
+def test_parallel_conversion_benchmark(make_bert_tokenizer):
+    tokenizer = make_bert_tokenizer(VOCAB)
+    examples = _corpus(100000)
+
+    timings = {}
+    for num_workers in sorted({1, 4, multiprocessing.cpu_count()}):
+        start = time.time()
+        features = convert_examples_to_features(
+            examples, LABELS, 32, tokenizer, num_workers=num_workers
+        )
+        timings[num_workers] = time.time() - start
+        assert len(features) == len(examples)
+
+    for num_workers, seconds in sorted(timings.items()):
+        print(
+            "{} workers: {:.2f} s ({:.0f} examples/s)".format(
+                num_workers, seconds, len(examples) / seconds
+            )
+        )
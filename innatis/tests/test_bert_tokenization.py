@@ -0,0 +1,199 @@
+import random
+import time
+
+import pytest
+import six
+
+from innatis.classifiers.bert.tokenization import (
+    BasicTokenizer,
+    FullTokenizer,
+    WordpieceTokenizer,
+    compile_vocab,
+    load_compiled_vocab,
+    load_vocab,
+    _compute_is_chinese_char,
+    _compute_is_control,
+    _compute_is_punctuation,
+    _compute_is_whitespace,
+    _is_control,
+    _is_punctuation,
+    _is_whitespace,
+)
+
+VOCAB = [
+    "[PAD]", "[UNK]", "[CLS]", "[SEP]", "un", "##aff", "##able", "affable",
+    "runn", "##ing", "run", "##s", "##n", "##e", "##", "#", "##a", "a", "b",
+    "ab", "##b", "##ab", "##abc", "c", "want", "##ed", "wa", "car", "##car",
+    "cars", "##ca", "x", "##x", "##xx", "##xxx", ",", "##,", "e", "é", "##é",
+]
+
+CORPUS = [
+    "unwanted running", "unaffable", "affable wanted", "abcabc", "aabbcc",
+    "ab##c", "##ab", "cars car carcar xxxxxxx", "runnning", "zzz", "é éé",
+    "a,b,c", "#", "##", "###", "wa,nt", "unrunnable",
+]
+
+
+def reference_tokenize(vocab, text, unk_token="[UNK]", max_chars=200):
+    """The original substring based greedy longest-match-first algorithm."""
+    output_tokens = []
+    for token in text.split():
+        chars = list(token)
+        if len(chars) > max_chars:
+            output_tokens.append(unk_token)
+            continue
+
+        is_bad = False
+        start = 0
+        sub_tokens = []
+        while start < len(chars):
+            end = len(chars)
+            cur_substr = None
+            while start < end:
+                substr = "".join(chars[start:end])
+                if start > 0:
+                    substr = "##" + substr
+                if substr in vocab:
+                    cur_substr = substr
+                    break
+                end -= 1
+            if cur_substr is None:
+                is_bad = True
+                break
+            sub_tokens.append(cur_substr)
+            start = end
+
+        if is_bad:
+            output_tokens.append(unk_token)
+        else:
+            output_tokens.extend(sub_tokens)
+    return output_tokens
+
+
+def _vocab():
+    return {token: i for i, token in enumerate(VOCAB)}
+
+
+def test_wordpiece_matches_reference_on_vocab():
+    vocab = _vocab()
+    tokenizer = WordpieceTokenizer(vocab=vocab)
+
+    for token in vocab:
+        for text in (token, token + token, token[2:] + token, "a" + token):
+            assert tokenizer.tokenize(text) == reference_tokenize(vocab, text)
+
+
+def test_wordpiece_matches_reference_on_corpus():
+    vocab = _vocab()
+    cached = WordpieceTokenizer(vocab=vocab)
+    uncached = WordpieceTokenizer(vocab=vocab, word_cache_size=0)
+
+    rng = random.Random(0)
+    alphabet = "abcexn#,é"
+    corpus = list(CORPUS)
+    for _ in range(2000):
+        corpus.append(
+            "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 12)))
+        )
+
+    # Tokenize twice, so that the second round is served from the cache
+    for _ in range(2):
+        for text in corpus:
+            expected = reference_tokenize(vocab, text)
+            assert cached.tokenize(text) == expected
+            assert uncached.tokenize(text) == expected
+
+
+def test_wordpiece_long_words_are_unknown():
+    tokenizer = WordpieceTokenizer(vocab=_vocab(), max_input_chars_per_word=5)
+
+    assert tokenizer.tokenize("abab ababab") == ["ab", "##ab", "[UNK]"]
+
+
+def _codepoints():
+    return list(range(0x10000)) + list(range(0x1F600, 0x1F650)) + [0x20000, 0x2FA1F]
+
+
+def test_char_class_table_matches_unicodedata():
+    tokenizer = BasicTokenizer()
+    for cp in _codepoints():
+        char = six.unichr(cp)
+        assert _is_whitespace(char) == _compute_is_whitespace(char)
+        assert _is_control(char) == _compute_is_control(char)
+        assert _is_punctuation(char) == _compute_is_punctuation(char)
+        assert tokenizer._is_chinese_char(cp) == _compute_is_chinese_char(cp)
+
+
+@pytest.mark.slow
+def test_char_class_table_benchmark():
+    rng = random.Random(0)
+    codepoints = _codepoints()
+    text = "".join(six.unichr(rng.choice(codepoints)) for _ in range(200000))
+    text += "plain ascii text, the common case! " * 5000
+
+    def chars_per_second(is_whitespace, is_control, is_punctuation):
+        start = time.time()
+        for char in text:
+            is_whitespace(char)
+            is_control(char)
+            is_punctuation(char)
+        return len(text) / (time.time() - start)
+
+    before = chars_per_second(
+        _compute_is_whitespace, _compute_is_control, _compute_is_punctuation
+    )
+    after = chars_per_second(_is_whitespace, _is_control, _is_punctuation)
+
+    print("unicodedata: {:.0f} chars/s".format(before))
+    print("class table: {:.0f} chars/s".format(after))
+
+
+def test_compiled_vocab_matches_vocab_file(tmpdir):
+    vocab_file = tmpdir.join("vocab.txt")
+    vocab_file.write("\n".join(VOCAB + ["dup", " spaced \r", "dup"]) + "\n")
+    compiled_vocab_file = str(tmpdir.join("vocab.txt.compiled"))
+
+    compile_vocab(str(vocab_file), compiled_vocab_file)
+    vocab, inv_vocab = load_compiled_vocab(compiled_vocab_file)
+
+    expected = load_vocab(str(vocab_file))
+    assert vocab == dict(expected)
+    for token, token_id in expected.items():
+        assert inv_vocab[token_id] == token
+
+
+def test_full_tokenizer_writes_and_reads_compiled_vocab(tmpdir):
+    vocab_file = tmpdir.join("vocab.txt")
+    vocab_file.write("\n".join(VOCAB))
+    compiled_vocab_file = tmpdir.join("vocab.txt.compiled")
+
+    plain = FullTokenizer(vocab_file=str(vocab_file))
+    compiling = FullTokenizer(
+        vocab_file=str(vocab_file), compiled_vocab_file=str(compiled_vocab_file)
+    )
+    assert compiled_vocab_file.check()
+    compiled = FullTokenizer(
+        vocab_file=None, compiled_vocab_file=str(compiled_vocab_file)
+    )
+
+    tokens = plain.tokenize("unwanted running cars")
+    ids = plain.convert_tokens_to_ids(tokens)
+    for tokenizer in (compiling, compiled):
+        assert tokenizer.tokenize("unwanted running cars") == tokens
+        assert tokenizer.convert_tokens_to_ids(tokens) == ids
+        assert tokenizer.convert_ids_to_tokens(ids) == tokens
+
+
+def test_save_compiled_vocab(tmpdir):
+    vocab_file = tmpdir.join("vocab.txt")
+    vocab_file.write("\n".join(VOCAB))
+    tokenizer = FullTokenizer(vocab_file=str(vocab_file))
+
+    tokenizer.save_compiled_vocab(str(tmpdir.join("saved.compiled")))
+    saved = FullTokenizer(
+        vocab_file=None, compiled_vocab_file=str(tmpdir.join("saved.compiled"))
+    )
+    saved.save_compiled_vocab(str(tmpdir.join("copy.compiled")))
+
+    vocab, _ = load_compiled_vocab(str(tmpdir.join("copy.compiled")))
+    assert vocab == dict(tokenizer.vocab)
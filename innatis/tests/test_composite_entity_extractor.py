@@ -3,7 +3,14 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import re
+import time
+
+import pytest
+from word2number import w2n
+
 from innatis.extractors import CompositeEntityExtractor
+from innatis.extractors.composite_entity_extractor import find_number
 
 entities = [
     {
@@ -121,3 +128,81 @@ def test_composite_entities():
             "number": 2
         }
     }
+
+
+def test_lookup_tables_sharing_a_name():
+    extractor = CompositeEntityExtractor(composite_entities={
+        "lookup_tables": [],
+        "composite_entities": [
+            {
+                "name": "car",
+                "composites": ["@make", "@number"]
+            }
+        ]
+    })
+    extractor.add_lookup_tables([
+        {"name": "make", "elements": ["audi", "bmw"]},
+        {"name": "make", "elements": ["mercedes benz", "benz"]},
+    ])
+
+    car = [{"entity": "car", "value": "two Benz"}]
+    extractor.split_composite_entities(car)
+    assert car[0]["value"] == {"make": "benz", "number": 2}
+
+    car = [{"entity": "car", "value": "3 audis or a bmw"}]
+    extractor.split_composite_entities(car)
+    assert car[0]["value"] == {"make": "bmw", "number": 3}
+
+
+@pytest.mark.slow
+def test_split_composite_entity_benchmark():
+    children = ["@part{}".format(i) for i in range(20)]
+    extractor = CompositeEntityExtractor(composite_entities={
+        "lookup_tables": [],
+        "composite_entities": [
+            {"name": "order", "composites": children + ["@number"]}
+        ]
+    })
+    extractor.add_lookup_tables([
+        {
+            "name": child[1:],
+            "elements": ["{} option {}".format(child[1:], j) for j in range(50)]
+        }
+        for child in children
+    ])
+    value = " ".join("part{} option {}".format(i, i) for i in range(0, 20, 2))
+
+    num_runs = 2000
+    start = time.time()
+    for _ in range(num_runs):
+        entities = [{"entity": "order", "value": value}]
+        extractor.split_composite_entities(entities)
+    seconds = time.time() - start
+
+    assert len(entities[0]["value"]) == 11
+    print("{:.3f} ms per entity".format(seconds * 1000 / num_runs))
+
+
+def reference_find_number(child_name, broad_value):
+    """What `split_by_sys` did before, a regex and then w2n"""
+    expression = r'\d{4}' if child_name == 'year' else r'\d+'
+    match = re.findall(expression, broad_value)
+    if match:
+        return match[0]
+    try:
+        return w2n.word_to_num(str(broad_value))
+    except ValueError:
+        return False
+
+
+def test_find_number_matches_w2n():
+    values = [
+        "rice and chicken", "yam, egg", "noodles", "four pieces", "5 orders",
+        "2 bottles of beer", "", "123", "twenty-one cars", "two thousand and nine", "a 2019 audi",
+        "one point five", "zero", "million million", "forty two", "red car",
+        "seven-seater", "year 98", "\u00b2", "hundred thousand",
+    ]
+    for value in values:
+        for child_name in ("number", "year"):
+            assert (find_number(child_name, value) ==
+                    reference_find_number(child_name, value)), value
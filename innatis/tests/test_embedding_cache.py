@@ -0,0 +1,106 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from innatis.featurizers.embedding_cache import EmbeddingCache
+
+
+def test_cache_hits_normalized_text():
+    cache = EmbeddingCache(max_size=10)
+
+    assert cache.get("hi") is None
+    cache.put("hi", np.ones(3))
+
+    assert np.array_equal(cache.get("hi"), np.ones(3))
+    assert np.array_equal(cache.get("  hi\n"), np.ones(3))
+    assert cache.get("Hi") is None
+    assert cache.stats() == {"hits": 2, "misses": 2, "hit_rate": 0.5, "size": 1}
+
+
+def test_cached_row_does_not_keep_the_batch():
+    cache = EmbeddingCache(max_size=10)
+    batch = np.ones((4, 3))
+    cache.put("hi", batch[1])
+
+    assert cache.get("hi").base is None
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = EmbeddingCache(max_size=2)
+    cache.put("yes", np.zeros(2))
+    cache.put("no", np.zeros(2))
+    cache.get("yes")
+    cache.put("menu", np.zeros(2))
+
+    assert cache.get("no") is None
+    assert cache.get("yes") is not None
+    assert cache.get("menu") is not None
+
+
+def test_disk_tier_survives_restarts(tmpdir):
+    cache_file = str(tmpdir.join("embeddings"))
+    cache = EmbeddingCache(max_size=1, cache_file=cache_file)
+    cache.put("yes", np.arange(3))
+    cache.put("no", np.arange(3) + 1)
+    # Evicted from memory, but still on disk
+    assert np.array_equal(cache.get("yes"), np.arange(3))
+    cache.close()
+
+    reopened = EmbeddingCache(max_size=0, cache_file=cache_file)
+    assert np.array_equal(reopened.get("no"), np.arange(3) + 1)
+    assert reopened.stats()["hits"] == 1
+    reopened.close()
+
+
+def test_cached_embeddings_are_read_only(tmpdir):
+    cache = EmbeddingCache(max_size=1, cache_file=str(tmpdir.join("embeddings")))
+    embedding = np.zeros(3)
+    cache.put("yes", embedding)
+    cache.put("no", embedding)
+    embedding[0] = 1
+
+    for text in ("yes", "no"):
+        cached = cache.get(text)
+        assert not cached.any()
+        with pytest.raises(ValueError):
+            cached[0] = 1
+    cache.close()
+
+
+def test_put_many_stores_every_embedding(tmpdir):
+    cache_file = str(tmpdir.join("embeddings"))
+    cache = EmbeddingCache(max_size=2, cache_file=cache_file)
+    batch = np.arange(12).reshape(4, 3)
+    cache.put_many(["a", "b", "c", "d"], batch)
+    cache.close()
+
+    reopened = EmbeddingCache(max_size=0, cache_file=cache_file)
+    for text, row in zip("abcd", batch):
+        assert np.array_equal(reopened.get(text), row)
+    reopened.close()
+
+
+def _put_embeddings(cache_file, offset):
+    cache = EmbeddingCache(max_size=0, cache_file=cache_file)
+    for i in range(50):
+        cache.put("text {}".format(offset + i), np.full(3, offset + i))
+    cache.close()
+
+
+def test_processes_share_the_disk_tier(tmpdir):
+    cache_file = str(tmpdir.join("embeddings"))
+    workers = [
+        multiprocessing.Process(target=_put_embeddings, args=(cache_file, offset))
+        for offset in (0, 50, 100)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert all(worker.exitcode == 0 for worker in workers)
+    cache = EmbeddingCache(max_size=0, cache_file=cache_file)
+    for i in range(150):
+        assert np.array_equal(cache.get("text {}".format(i)), np.full(3, i))
+    cache.close()
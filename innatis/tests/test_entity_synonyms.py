@@ -1,3 +1,6 @@
+import random
+import time
+
 from innatis.extractors import EntitySynonymMapper
 from rasa.nlu.model import Metadata
 import pytest
@@ -128,3 +131,72 @@ def test_composite_entity_fuzzy_match():
     assert entities[1]["value"]["cuisine"] == "Italian"
     # Fuzzy-matches with original value (NewYork City -> New York City)
     assert entities[1]["value"]["location"] == "New York City"
+
+
+def brute_force_fuzzy_match(synonyms, lookup_value, threshold):
+    """What `fuzzy_match_entity` did before, comparing with every string"""
+    fuzzy_match = None
+    for synonym in synonyms.keys():
+        similarity = EntitySynonymMapper.calc_similarity(synonym, lookup_value)
+        if similarity >= threshold:
+            candidate = (similarity, synonyms[synonym])
+            fuzzy_match = max(candidate, fuzzy_match) if fuzzy_match else candidate
+    for original_value in set(synonyms.values()):
+        similarity = EntitySynonymMapper.calc_similarity(original_value.lower(), lookup_value)
+        if similarity >= threshold:
+            candidate = (similarity, original_value)
+            fuzzy_match = max(candidate, fuzzy_match) if fuzzy_match else candidate
+    return fuzzy_match[1] if fuzzy_match else None
+
+
+def _random_synonyms(rng, num_synonyms, alphabet="abcde "):
+    def word():
+        return "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 10)))
+
+    values = [word().upper() if rng.random() < 0.2 else word()
+              for _ in range(num_synonyms // 3 + 1)]
+    return {word(): rng.choice(values) for _ in range(num_synonyms)}
+
+
+def test_fuzzy_index_matches_brute_force():
+    rng = random.Random(0)
+    for threshold in (0.0, 0.5, 0.75, 0.9, 1.0):
+        synonyms = _random_synonyms(rng, 300)
+        mapper = EntitySynonymMapper({"fuzzy_threshold": threshold},
+                                     synonyms=synonyms)
+        for _ in range(200):
+            lookup_value = "".join(rng.choice("abcdef ")
+                                   for _ in range(rng.randint(1, 12)))
+            assert (mapper.fuzzy_match_entity(lookup_value) ==
+                    brute_force_fuzzy_match(synonyms, lookup_value, threshold))
+
+
+def test_fuzzy_index_follows_new_synonyms():
+    mapper = EntitySynonymMapper(synonyms={"nyc": "New York City"})
+    assert mapper.fuzzy_match_entity("chinees") is None
+
+    mapper.add_entities_if_synonyms("chineese", "chinese")
+    assert mapper.fuzzy_match_entity("chinees") == "chinese"
+
+
+@pytest.mark.slow
+def test_fuzzy_match_benchmark():
+    rng = random.Random(1)
+    synonyms = _random_synonyms(rng, 50000, alphabet="abcdefghijklmnop")
+    mapper = EntitySynonymMapper(synonyms=synonyms)
+    lookup_values = ["".join(rng.choice("abcdefghijklmnop")
+                             for _ in range(rng.randint(4, 10)))
+                     for _ in range(20)]
+
+    start = time.time()
+    for lookup_value in lookup_values:
+        brute_force_fuzzy_match(synonyms, lookup_value, 0.9)
+    brute_force = (time.time() - start) / len(lookup_values)
+
+    start = time.time()
+    for lookup_value in lookup_values:
+        mapper.fuzzy_match_entity(lookup_value)
+    indexed = (time.time() - start) / len(lookup_values)
+
+    print("brute force: {:.2f} ms per miss".format(brute_force * 1000))
+    print("fuzzy index: {:.2f} ms per miss".format(indexed * 1000))
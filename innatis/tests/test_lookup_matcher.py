@@ -0,0 +1,44 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import random
+import re
+
+from innatis.extractors.lookup_matcher import LookupMatcher
+
+
+def reference_search(elements, text):
+    """What `break_on_lookup_tables` did before, one regex per element."""
+    for element in elements:
+        if re.search(r"\b" + re.escape(element.lower()) + r"\b", text):
+            return element
+    return None
+
+
+def test_longest_element_wins():
+    elements = ["mercedes benz", "mercedes", "benz", "c class", "class"]
+    matcher = LookupMatcher(elements)
+
+    assert matcher.search("a mercedes benz c class") == "mercedes benz"
+    assert matcher.search("my benz") == "benz"
+    assert matcher.search("mercedesbenz classy") is None
+    assert matcher.search("first-class") == "class"
+
+
+def test_matches_regex_search():
+    rng = random.Random(0)
+    alphabet = "abAB_1 -.é"
+
+    def random_text(max_length):
+        return "".join(
+            rng.choice(alphabet) for _ in range(rng.randint(0, max_length))
+        )
+
+    for _ in range(300):
+        elements = [random_text(4) for _ in range(rng.randint(1, 12))]
+        matcher = LookupMatcher(elements)
+        for _ in range(20):
+            text = random_text(16).lower()
+            assert matcher.search(text) == reference_search(elements, text)
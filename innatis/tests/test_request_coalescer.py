@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+from innatis.classifiers.request_coalescer import RequestCoalescer
+
+
+def _submit_concurrently(coalescer, items):
+    errors = []
+
+    def submit(item):
+        try:
+            coalescer.submit(item)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=submit, args=(item,)) for item in items]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def test_concurrent_requests_are_batched():
+    batches = []
+    processed = []
+
+    def process_batch(items):
+        batches.append(len(items))
+        processed.extend(items)
+
+    coalescer = RequestCoalescer(process_batch, max_batch_size=8, max_wait_ms=200)
+    errors = _submit_concurrently(coalescer, list(range(20)))
+    coalescer.close()
+
+    assert not errors
+    assert sorted(processed) == list(range(20))
+    assert max(batches) <= 8
+    assert len(batches) < 20
+
+
+def test_submit_blocks_until_processed():
+    def process_batch(items):
+        for item in items:
+            item["done"] = True
+
+    coalescer = RequestCoalescer(process_batch, max_batch_size=4, max_wait_ms=1)
+    item = {"done": False}
+    coalescer.submit(item)
+    coalescer.close()
+
+    assert item["done"]
+
+
+def test_errors_are_raised_in_callers():
+    def process_batch(items):
+        raise ValueError("broken batch")
+
+    coalescer = RequestCoalescer(process_batch, max_batch_size=4, max_wait_ms=50)
+    errors = _submit_concurrently(coalescer, list(range(4)))
+    coalescer.close()
+
+    assert len(errors) == 4
+    assert all(isinstance(e, ValueError) for e in errors)
+
+
+def test_closed_coalescer_rejects_requests():
+    coalescer = RequestCoalescer(lambda items: None)
+    coalescer.close()
+
+    with pytest.raises(RuntimeError):
+        coalescer.submit("hello")
+
+
+def test_stopped_worker_releases_waiting_callers():
+    started = threading.Event()
+
+    def process_batch(items):
+        started.set()
+        # Queued while the worker is busy, so it never gets to these
+        queued.extend(
+            threading.Thread(target=submit, args=(item,)) for item in (1, 2)
+        )
+        for thread in queued:
+            thread.start()
+        while coalescer._queue.qsize() < len(queued):
+            time.sleep(0.001)
+        raise KeyboardInterrupt()
+
+    errors = []
+    queued = []
+
+    def submit(item):
+        try:
+            coalescer.submit(item)
+        except Exception as e:
+            errors.append(e)
+
+    coalescer = RequestCoalescer(process_batch, max_batch_size=1, max_wait_ms=1)
+    first = threading.Thread(target=submit, args=(0,))
+    first.start()
+    first.join(timeout=5)
+    for thread in queued:
+        thread.join(timeout=5)
+
+    assert started.is_set()
+    assert not first.is_alive()
+    assert not any(thread.is_alive() for thread in queued)
+    assert len(errors) == 3
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    with pytest.raises(RuntimeError):
+        coalescer.submit(3)
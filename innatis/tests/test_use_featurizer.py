@@ -1,13 +1,30 @@
 import json
+import numpy as np
 import pytest
 from innatis.featurizers import UniversalSentenceEncoderFeaturizer
 from rasa.nlu.model import Interpreter
+from rasa.nlu.training_data import Message
 from rasa.nlu import config, train
 
 @pytest.mark.slow
 def test_it_instantiates():
     assert UniversalSentenceEncoderFeaturizer({}) is not None
 
+@pytest.mark.slow
+def test_persisted_featurizer_loads(tmpdir):
+    featurizer = UniversalSentenceEncoderFeaturizer({})
+    message = Message("hello")
+    featurizer.process(message)
+
+    meta = featurizer.persist("use_featurizer", str(tmpdir))
+    loaded = UniversalSentenceEncoderFeaturizer.load(meta, str(tmpdir))
+    loaded_message = Message("hello")
+    loaded.process(loaded_message)
+
+    assert loaded.module_path == str(tmpdir.join(meta["module_file"]))
+    assert np.allclose(loaded_message.get("text_features"),
+                       message.get("text_features"))
+
 @pytest.mark.slow
 def test_train_featurizer():
     (trained, _, _) = train.do_train(